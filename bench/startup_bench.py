@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tiempo de arranque de nvim-matlab-py.
+Lanza Neovim en modo headless varias veces y reporta:
+  - el delta de --startuptime con y sin el plugin en sesiones sin MATLAB
+  - la latencia del primer comando (y del segundo) en sesiones con un archivo .m
+No necesita MATLAB: el ejecutable se sustituye por uno falso (`cat` por defecto).
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_init(directory, with_plugin, fake_matlab):
+    """Escribe un init.lua mínimo, con o sin el plugin en el runtimepath"""
+    path = os.path.join(directory, 'init_plugin.lua' if with_plugin else 'init_bare.lua')
+    with open(path, 'w') as f:
+        if with_plugin:
+            f.write(f"vim.opt.rtp:prepend({PLUGIN_DIR!r})\n")
+        f.write(f"vim.g.matlab_executable = {fake_matlab!r}\n")
+        f.write("vim.cmd('filetype plugin on')\n")
+    return path
+
+
+def parse_startuptime(log_path):
+    """Devuelve (total_ms, ms atribuidos al plugin) de un log de --startuptime"""
+    total = 0.0
+    plugin = 0.0
+    with open(log_path) as f:
+        for line in f:
+            parts = line.split()
+            if 'NVIM STARTED' in line and parts:
+                total = float(parts[0])
+            elif 'nvim_matlab_py' in line and 'sourcing' in line and len(parts) > 2:
+                # formato: reloj  self+sourced  self:  sourcing <archivo>
+                plugin += float(parts[1])
+    return total, plugin
+
+
+def run_startup(nvim, init, workdir):
+    """Mide una sesión sin archivos MATLAB"""
+    log_path = os.path.join(workdir, 'startuptime.log')
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    subprocess.run(
+        [nvim, '--headless', '-i', 'NONE', '-u', init, '--startuptime', log_path, '+qa!'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=60
+    )
+    return parse_startuptime(log_path)
+
+
+def run_first_command(nvim, init, workdir, command):
+    """Mide la latencia del primer y segundo comando en una sesión con un archivo .m"""
+    source = os.path.join(workdir, 'bench_script.m')
+    with open(source, 'w') as f:
+        f.write("x = 1;\n%% celda\ndisp(x)\n")
+    result = os.path.join(workdir, 'latency.txt')
+    measure = (
+        "local uv = vim.uv or vim.loop; "
+        "local t0 = uv.hrtime(); vim.cmd({cmd!r}); local t1 = uv.hrtime(); "
+        "vim.cmd({cmd!r}); local t2 = uv.hrtime(); "
+        "vim.fn.writefile({{tostring((t1 - t0) / 1e6), tostring((t2 - t1) / 1e6)}}, {out!r})"
+    ).format(cmd=command, out=result)
+    subprocess.run(
+        [nvim, '--headless', '-i', 'NONE', '-u', init, source, '+lua ' + measure, '+qa!'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=60
+    )
+    with open(result) as f:
+        first, second = (float(v) for v in f.read().split())
+    return first, second
+
+
+def summary(values):
+    return f"mediana {statistics.median(values):8.2f} ms  min {min(values):8.2f} ms  max {max(values):8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque de nvim-matlab-py')
+    parser.add_argument('--nvim', default='nvim', help='Ejecutable de Neovim (predeterminado: nvim)')
+    parser.add_argument('--runs', type=int, default=10, help='Repeticiones por escenario (predeterminado: 10)')
+    parser.add_argument('--command', default='MatlabToggleWindow',
+                        help='Comando a medir en sesiones MATLAB (predeterminado: MatlabToggleWindow)')
+    parser.add_argument('--fake-matlab', default='cat',
+                        help='Ejecutable que sustituye a MATLAB (predeterminado: cat)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='nvim_matlab_py_bench_') as workdir:
+        bare = write_init(workdir, False, args.fake_matlab)
+        plugin = write_init(workdir, True, args.fake_matlab)
+
+        bare_totals, plugin_totals, plugin_own, deltas = [], [], [], []
+        for _ in range(args.runs):
+            bare_total, _ = run_startup(args.nvim, bare, workdir)
+            plugin_total, own = run_startup(args.nvim, plugin, workdir)
+            bare_totals.append(bare_total)
+            plugin_totals.append(plugin_total)
+            plugin_own.append(own)
+            deltas.append(plugin_total - bare_total)
+
+        firsts, seconds = [], []
+        for _ in range(args.runs):
+            first, second = run_first_command(args.nvim, plugin, workdir, args.command)
+            firsts.append(first)
+            seconds.append(second)
+
+    print(f"== Sesiones sin MATLAB ({args.runs} ejecuciones, --startuptime) ==")
+    print(f"sin plugin          {summary(bare_totals)}")
+    print(f"con plugin          {summary(plugin_totals)}")
+    print(f"delta               {summary(deltas)}")
+    print(f"plugin/*.vim        {summary(plugin_own)}")
+    print(f"== Sesiones MATLAB (:{args.command}) ==")
+    print(f"primer comando      {summary(firsts)}")
+    print(f"segundo comando     {summary(seconds)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
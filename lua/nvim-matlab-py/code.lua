@@ -0,0 +1,63 @@
+-- nvim-matlab-py: extracción del código a ejecutar desde un buffer
+-- (misma lógica que las funciones run_* de python3/nvim_matlab_py.py)
+
+local M = {}
+
+local function is_cell_header(line)
+  return vim.trim(line):sub(1, 2) == '%%'
+end
+
+-- Celda que contiene la fila `row` (base 1): devuelve primera fila, última
+-- fila y sus líneas
+M.cell = function(bufnr, row)
+  bufnr = bufnr or vim.api.nvim_get_current_buf()
+  row = row or vim.api.nvim_win_get_cursor(0)[1]
+  local lines = vim.api.nvim_buf_get_lines(bufnr, 0, -1, false)
+
+  -- Buscar hacia atrás el inicio de la celda
+  local first = row
+  while first > 1 and not is_cell_header(lines[first - 1]) do
+    first = first - 1
+  end
+
+  -- Buscar hacia adelante el final de la celda
+  local last = row
+  while last < #lines and not is_cell_header(lines[last + 1]) do
+    last = last + 1
+  end
+
+  return first, last, vim.list_slice(lines, first, last)
+end
+
+-- Línea actual
+M.line = function()
+  return vim.api.nvim_get_current_line()
+end
+
+-- Última selección visual
+M.selection = function()
+  local start_pos = vim.fn.getpos("'<")
+  local end_pos = vim.fn.getpos("'>")
+  local lines = vim.api.nvim_buf_get_lines(0, start_pos[2] - 1, end_pos[2], false)
+  if #lines == 0 then
+    return ''
+  end
+  -- Ajustar primera y última línea para considerar columnas
+  lines[#lines] = lines[#lines]:sub(1, end_pos[3])
+  lines[1] = lines[1]:sub(start_pos[3])
+  return table.concat(lines, '\n')
+end
+
+-- Escapa un texto para usarlo como literal de cadena de MATLAB
+M.matlab_string = function(value)
+  return "'" .. value:gsub("'", "''") .. "'"
+end
+
+-- Comandos para ejecutar un archivo .m desde su directorio
+M.file = function(path)
+  local directory = vim.fn.fnamemodify(path, ':h')
+  local basename = vim.fn.fnamemodify(path, ':t:r')
+  return string.format('cd(%s);\nrun(%s);', M.matlab_string(directory), M.matlab_string(basename))
+end
+
+return M
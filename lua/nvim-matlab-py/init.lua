@@ -11,6 +11,22 @@ M.setup = function(opts)
     vim.g.matlab_executable = opts.matlab_executable
   end
   
+  -- Diagnósticos de checkcode
+  if opts.lint == false then
+    vim.g.matlab_lint = 0
+  end
+  if opts.lint_debounce then
+    vim.g.matlab_lint_debounce = opts.lint_debounce
+  end
+  
+  -- Historial persistente de comandos
+  if opts.history == false then
+    vim.g.matlab_history = 0
+  end
+  if opts.history_dir then
+    vim.g.matlab_history_dir = opts.history_dir
+  end
+  
   -- Deshabilitar mapeos predeterminados
   if opts.disable_default_mappings then
     vim.g.matlab_disable_default_mappings = true
@@ -45,21 +61,53 @@ M.setup = function(opts)
   end
 end
 
--- Funciones directas para usar en Lua
-M.run_file = function()
-  vim.cmd('MatlabRun')
+-- Ejecuta código en MATLAB sin bloquear; devuelve un handle cancelable.
+-- Ver require('nvim-matlab-py.server').exec para las opciones y el resultado.
+M.exec = function(code, opts)
+  return require('nvim-matlab-py.server').exec(code, opts)
 end
 
-M.run_cell = function()
-  vim.cmd('MatlabRunCell')
+-- Funciones directas para usar en Lua. Sin argumentos equivalen a los
+-- comandos :Matlab*; con `opts` ({ on_output =, on_done = }) ejecutan con
+-- M.exec y devuelven su handle.
+M.run_file = function(opts)
+  if not opts then
+    return vim.cmd('MatlabRun')
+  end
+  local path = vim.api.nvim_buf_get_name(0)
+  if not path:match('%.m$') then
+    vim.notify('El archivo actual no es un archivo MATLAB (.m)', vim.log.levels.ERROR)
+    return
+  end
+  return M.exec(require('nvim-matlab-py.code').file(path), opts)
 end
 
-M.run_line = function()
-  vim.cmd('MatlabRunLine')
+M.run_cell = function(opts)
+  if not opts then
+    return vim.cmd('MatlabRunCell')
+  end
+  local _, _, lines = require('nvim-matlab-py.code').cell()
+  return M.exec(table.concat(lines, '\n'), opts)
 end
 
-M.run_selection = function()
-  vim.cmd('MatlabRunSelection')
+M.run_line = function(opts)
+  if not opts then
+    return vim.cmd('MatlabRunLine')
+  end
+  local line = require('nvim-matlab-py.code').line()
+  if vim.trim(line) ~= '' then
+    return M.exec(line, opts)
+  end
+end
+
+M.run_selection = function(opts)
+  if not opts then
+    return vim.cmd('MatlabRunSelection')
+  end
+  local selection = require('nvim-matlab-py.code').selection()
+  if vim.trim(selection) ~= '' then
+    return M.exec(selection, opts)
+  end
 end
 
 M.toggle_file = function()
@@ -78,4 +126,20 @@ M.toggle_window = function()
   vim.cmd('MatlabToggleWindow')
 end
 
+M.lint = function(bufnr)
+  require('nvim-matlab-py.lint').lint(bufnr)
+end
+
+M.history = function(args)
+  vim.cmd('MatlabHistory ' .. (args or ''))
+end
+
+M.profile_cell = function()
+  return require('nvim-matlab-py.profile').profile_cell()
+end
+
+M.profile_file = function()
+  return require('nvim-matlab-py.profile').profile_file()
+end
+
 return M
@@ -0,0 +1,155 @@
+-- nvim-matlab-py: diagnósticos de checkcode a través de la sesión de MATLAB en ejecución
+--
+-- Los análisis se envían a matlab_server.py como trabajos de baja prioridad,
+-- nunca arrancan un MATLAB propio. Se agrupan con un debounce tras cada cambio
+-- y se cachean por hash del contenido, así un buffer sin cambios no se vuelve
+-- a analizar. Si el buffer cambió antes de recibir el resultado, este se
+-- guarda en la caché pero no se muestra.
+
+local server = require('nvim-matlab-py.server')
+
+local M = {}
+
+local uv = vim.uv or vim.loop
+
+M.namespace = vim.api.nvim_create_namespace('nvim-matlab-py-lint')
+
+-- Resultados por hash del contenido (sha256), con tamaño limitado
+local cache = {}
+local cache_order = {}
+local CACHE_SIZE = 128
+
+-- Estado por buffer: temporizador de debounce
+local buffers = {}
+
+local function cache_put(hash, diagnostics)
+  if cache[hash] == nil then
+    table.insert(cache_order, hash)
+    if #cache_order > CACHE_SIZE then
+      cache[table.remove(cache_order, 1)] = nil
+    end
+  end
+  cache[hash] = diagnostics
+end
+
+-- Convierte los mensajes de checkcode en entradas de vim.diagnostic
+local function to_diagnostics(messages)
+  local diagnostics = {}
+  for _, message in ipairs(messages) do
+    local column = message.column or { 1, 1 }
+    table.insert(diagnostics, {
+      lnum = math.max((message.line or 1) - 1, 0),
+      col = math.max((column[1] or 1) - 1, 0),
+      end_col = column[2] or column[1] or 1,
+      severity = vim.diagnostic.severity.WARN,
+      message = message.message,
+      code = message.id,
+      source = 'checkcode',
+    })
+  end
+  return diagnostics
+end
+
+local function show(bufnr, diagnostics)
+  if vim.api.nvim_buf_is_valid(bufnr) then
+    vim.diagnostic.set(M.namespace, bufnr, diagnostics)
+  end
+end
+
+-- Analiza el buffer ahora mismo (sin debounce)
+M.lint = function(bufnr)
+  bufnr = bufnr or vim.api.nvim_get_current_buf()
+  if not vim.api.nvim_buf_is_valid(bufnr) then
+    return
+  end
+
+  -- checkcode necesita un archivo .m con el mismo nombre (los avisos sobre
+  -- el nombre de la función dependen de él), así que el nombre forma parte
+  -- de la clave de la caché
+  local name = vim.fn.fnamemodify(vim.api.nvim_buf_get_name(bufnr), ':t')
+  if name == '' then
+    name = 'untitled.m'
+  end
+  local lines = vim.api.nvim_buf_get_lines(bufnr, 0, -1, false)
+  local hash = vim.fn.sha256(name .. '\n' .. table.concat(lines, '\n'))
+  local cached = cache[hash]
+  if cached then
+    show(bufnr, cached)
+    return
+  end
+
+  -- Un directorio temporal por análisis para no pisar un archivo que aún se
+  -- esté leyendo
+  local directory = vim.fn.tempname()
+  vim.fn.mkdir(directory, 'p')
+  local path = directory .. '/' .. name
+  vim.fn.writefile(lines, path)
+
+  local tick = vim.api.nvim_buf_get_changedtick(bufnr)
+  -- La clave incluye el PID: el servidor puede ser compartido por varios Neovim
+  local key = vim.fn.getpid() .. ':' .. bufnr
+  server.request({ type = 'lint', path = path, key = key }, function(response)
+    vim.fn.delete(directory, 'rf')
+    -- Sin servidor en ejecución no hay diagnósticos: no se arranca MATLAB
+    if not response or response.status ~= 'success' then
+      return
+    end
+    local diagnostics = to_diagnostics(response.diagnostics or {})
+    cache_put(hash, diagnostics)
+    -- Descartar resultados obsoletos si el buffer cambió mientras tanto
+    if vim.api.nvim_buf_is_valid(bufnr) and vim.api.nvim_buf_get_changedtick(bufnr) == tick then
+      show(bufnr, diagnostics)
+    end
+  end)
+end
+
+-- Programa un análisis tras `g:matlab_lint_debounce` ms sin cambios
+M.schedule = function(bufnr)
+  local state = buffers[bufnr]
+  if not state then
+    return
+  end
+  state.timer:stop()
+  state.timer:start(tonumber(vim.g.matlab_lint_debounce) or 500, 0, vim.schedule_wrap(function()
+    M.lint(bufnr)
+  end))
+end
+
+-- Activa el análisis automático en un buffer MATLAB
+M.attach = function(bufnr)
+  bufnr = bufnr or vim.api.nvim_get_current_buf()
+  if buffers[bufnr] or vim.g.matlab_lint == 0 or vim.g.matlab_lint == false then
+    return
+  end
+  buffers[bufnr] = { timer = uv.new_timer() }
+
+  local group = 'nvim_matlab_py_lint_' .. bufnr
+  vim.cmd('augroup ' .. group)
+  vim.cmd('autocmd!')
+  vim.cmd(string.format(
+    "autocmd TextChanged,InsertLeave,BufWritePost <buffer=%d> lua require('nvim-matlab-py.lint').schedule(%d)",
+    bufnr, bufnr))
+  vim.cmd(string.format(
+    "autocmd BufWipeout <buffer=%d> lua require('nvim-matlab-py.lint').detach(%d)",
+    bufnr, bufnr))
+  vim.cmd('augroup END')
+
+  M.schedule(bufnr)
+end
+
+-- Desactiva el análisis automático y borra los diagnósticos del buffer
+M.detach = function(bufnr)
+  local state = buffers[bufnr]
+  if not state then
+    return
+  end
+  state.timer:stop()
+  state.timer:close()
+  buffers[bufnr] = nil
+  vim.cmd('silent! autocmd! nvim_matlab_py_lint_' .. bufnr)
+  if vim.api.nvim_buf_is_valid(bufnr) then
+    vim.diagnostic.reset(M.namespace, bufnr)
+  end
+end
+
+return M
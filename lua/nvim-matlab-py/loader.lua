@@ -0,0 +1,53 @@
+-- nvim-matlab-py: carga diferida del lado Python
+
+local M = {}
+
+local loaded = false
+
+-- Importa el módulo Python nvim_matlab_py (solo la primera vez)
+M.load = function()
+  if loaded then
+    return true
+  end
+
+  -- has('python3') arranca la detección del proveedor, por eso se hace aquí
+  -- y no al iniciar Neovim
+  if vim.fn.has('python3') == 0 then
+    vim.notify('nvim-matlab-py requiere Neovim con soporte Python3', vim.log.levels.ERROR)
+    return false
+  end
+
+  -- Configuración predeterminada
+  if vim.g.matlab_executable == nil then
+    if vim.fn.executable('matlab') == 1 then
+      vim.g.matlab_executable = 'matlab'
+    else
+      vim.notify('nvim-matlab-py: No se encontró MATLAB. Configure g:matlab_executable', vim.log.levels.WARN)
+    end
+  end
+
+  vim.cmd('python3 import nvim_matlab_py')
+  loaded = true
+  return true
+end
+
+-- Indica si el lado Python ya fue cargado
+M.is_loaded = function()
+  return loaded
+end
+
+-- Ejecuta una función de nvim_matlab_py cargando el módulo si hace falta. Los
+-- argumentos viajan en g:nvim_matlab_py_args y se leen con vim.eval; nunca se
+-- convierten en código Python.
+M.call = function(fn, ...)
+  if M.load() then
+    vim.g.nvim_matlab_py_args = { ... }
+    local ok, err = pcall(vim.cmd, 'python3 nvim_matlab_py.' .. fn .. '(*vim.eval("g:nvim_matlab_py_args"))')
+    vim.g.nvim_matlab_py_args = nil
+    if not ok then
+      error(err, 0)
+    end
+  end
+end
+
+return M
@@ -0,0 +1,364 @@
+-- nvim-matlab-py: perfilador de MATLAB integrado
+--
+-- Ejecuta la celda o el archivo actual entre `profile on` y `profile off` y
+-- recupera `profile('info')` como JSON a través de un archivo temporal. El
+-- tiempo y las llamadas por línea se muestran como texto virtual y un mapa
+-- de calor en la columna de signos; las funciones más costosas, en una
+-- ventana flotante ordenable. Los resultados se guardan por versión de
+-- archivo (hash del contenido), así al volver a un buffer sin cambios se
+-- muestran de nuevo sin volver a pedirlos a MATLAB.
+
+local code = require('nvim-matlab-py.code')
+local server = require('nvim-matlab-py.server')
+
+local M = {}
+
+M.namespace = vim.api.nvim_create_namespace('nvim-matlab-py-profile')
+
+local HEAT_LEVELS = 5
+local HEAT_COLORS = { '#5f87af', '#87af5f', '#d7af5f', '#d7875f', '#d75f5f' }
+
+-- Resultados por archivo y por hash de su contenido: cache[archivo][hash] = líneas
+local cache = {}
+-- Versiones conservadas por archivo
+local CACHE_VERSIONS = 5
+
+-- Funciones del último perfil, para el resumen
+M.functions = {}
+
+local function define_highlights()
+  for level, color in ipairs(HEAT_COLORS) do
+    vim.api.nvim_set_hl(0, 'MatlabProfileHeat' .. level, { default = true, fg = color })
+  end
+  vim.api.nvim_set_hl(0, 'MatlabProfileText', { default = true, link = 'Comment' })
+end
+
+local function normalize(path)
+  return vim.fn.fnamemodify(path, ':p')
+end
+
+-- Clave de caché de un buffer: su ruta o, si no tiene nombre, su número
+local function buffer_key(bufnr)
+  local name = vim.api.nvim_buf_get_name(bufnr)
+  return name ~= '' and normalize(name) or ('#' .. bufnr)
+end
+
+local function content_hash(lines)
+  return vim.fn.sha256(table.concat(lines, '\n'))
+end
+
+-- Contenido en disco de un archivo, que es lo que ejecutó MATLAB: un buffer
+-- con cambios sin guardar no coincide y no muestra las anotaciones
+local function file_lines(path)
+  if vim.fn.filereadable(path) == 1 then
+    return vim.fn.readfile(path)
+  end
+  return nil
+end
+
+-- jsonencode devuelve un objeto (y no una lista) para un struct 1x1, y una
+-- fila plana para una matriz de una sola fila
+local function as_list(value)
+  if value == nil or value == vim.NIL or next(value) == nil then
+    return {}
+  end
+  if (vim.islist or vim.tbl_islist)(value) then
+    return value
+  end
+  return { value }
+end
+
+local function as_rows(value)
+  value = as_list(value)
+  if type(value[1]) == 'number' then
+    return { value }
+  end
+  return value
+end
+
+-- Agrupa el FunctionTable por archivo y línea y calcula el tiempo propio de cada función
+local function parse(table_entries)
+  local functions = {}
+  local files = {}
+  for _, entry in ipairs(table_entries) do
+    local children_time = 0
+    for _, child in ipairs(as_list(entry.Children)) do
+      children_time = children_time + (tonumber(child.TotalTime) or 0)
+    end
+    local total = tonumber(entry.TotalTime) or 0
+    table.insert(functions, {
+      name = entry.FunctionName,
+      file = entry.FileName ~= vim.NIL and entry.FileName or '',
+      calls = tonumber(entry.NumCalls) or 0,
+      total = total,
+      self = math.max(total - children_time, 0),
+    })
+
+    if type(entry.FileName) == 'string' and entry.FileName ~= '' then
+      local file = normalize(entry.FileName)
+      files[file] = files[file] or {}
+      for _, row in ipairs(as_rows(entry.ExecutedLines)) do
+        local line, calls, time = row[1], row[2], row[3]
+        local stats = files[file][line] or { calls = 0, time = 0 }
+        stats.calls = stats.calls + calls
+        stats.time = stats.time + time
+        files[file][line] = stats
+      end
+    end
+  end
+  return functions, files
+end
+
+local function store(key, hash, lines)
+  cache[key] = cache[key] or { order = {}, versions = {} }
+  local entry = cache[key]
+  if not entry.versions[hash] then
+    table.insert(entry.order, hash)
+    if #entry.order > CACHE_VERSIONS then
+      entry.versions[table.remove(entry.order, 1)] = nil
+    end
+  end
+  entry.versions[hash] = lines
+end
+
+-- Dibuja en el buffer las estadísticas por línea de su versión actual
+M.render = function(bufnr)
+  bufnr = bufnr or vim.api.nvim_get_current_buf()
+  vim.api.nvim_buf_clear_namespace(bufnr, M.namespace, 0, -1)
+  local entry = cache[buffer_key(bufnr)]
+  if not entry then
+    return
+  end
+  local buffer_lines = vim.api.nvim_buf_get_lines(bufnr, 0, -1, false)
+  local lines = entry.versions[content_hash(buffer_lines)]
+  if not lines then
+    return
+  end
+
+  local max_time = 0
+  for _, stats in pairs(lines) do
+    max_time = math.max(max_time, stats.time)
+  end
+  for line, stats in pairs(lines) do
+    if line >= 1 and line <= #buffer_lines then
+      local level = max_time > 0 and math.max(math.ceil(stats.time / max_time * HEAT_LEVELS), 1) or 1
+      local heat = 'MatlabProfileHeat' .. level
+      vim.api.nvim_buf_set_extmark(bufnr, M.namespace, line - 1, 0, {
+        virt_text = { { string.format('  %9.3f ms  %7dx', stats.time * 1000, stats.calls),
+                        level >= HEAT_LEVELS - 1 and heat or 'MatlabProfileText' } },
+        virt_text_pos = 'eol',
+        sign_text = '▌',
+        sign_hl_group = heat,
+      })
+    end
+  end
+end
+
+-- Borra las anotaciones de todos los buffers y la caché
+M.clear = function()
+  cache = {}
+  M.functions = {}
+  for _, bufnr in ipairs(vim.api.nvim_list_bufs()) do
+    if vim.api.nvim_buf_is_loaded(bufnr) then
+      vim.api.nvim_buf_clear_namespace(bufnr, M.namespace, 0, -1)
+    end
+  end
+end
+
+local SORT_KEYS = {
+  t = { field = 'total', label = 'total' },
+  s = { field = 'self', label = 'propio' },
+  c = { field = 'calls', label = 'llamadas' },
+  n = { field = 'name', label = 'nombre' },
+}
+
+-- Muestra las funciones más costosas en una ventana flotante; dentro de ella
+-- t/s/c/n ordenan por tiempo total, propio, llamadas o nombre, <CR> abre la
+-- función y q cierra
+M.summary = function(sort_key)
+  if #M.functions == 0 then
+    vim.notify('No hay resultados del perfilador', vim.log.levels.INFO)
+    return
+  end
+  sort_key = sort_key or 't'
+  local sort = SORT_KEYS[sort_key] or SORT_KEYS.t
+  local functions = vim.list_slice(M.functions, 1)
+  table.sort(functions, function(a, b)
+    if sort.field == 'name' then
+      return a.name < b.name
+    end
+    return a[sort.field] > b[sort.field]
+  end)
+  local limit = math.min(#functions, tonumber(vim.g.matlab_profile_top) or 30)
+
+  local lines = {
+    string.format('%-40s %9s %12s %12s', 'Función (orden: ' .. sort.label .. ')', 'Llamadas', 'Total (ms)', 'Propio (ms)'),
+  }
+  for index = 1, limit do
+    local fn = functions[index]
+    table.insert(lines, string.format('%-40s %9d %12.3f %12.3f',
+      fn.name:sub(1, 40), fn.calls, fn.total * 1000, fn.self * 1000))
+  end
+
+  local bufnr = vim.api.nvim_create_buf(false, true)
+  vim.api.nvim_buf_set_lines(bufnr, 0, -1, false, lines)
+  vim.bo[bufnr].modifiable = false
+  vim.bo[bufnr].bufhidden = 'wipe'
+  local width = 0
+  for _, line in ipairs(lines) do
+    width = math.max(width, vim.fn.strdisplaywidth(line))
+  end
+  local height = math.min(#lines, math.max(vim.o.lines - 6, 1))
+  local win = vim.api.nvim_open_win(bufnr, true, {
+    relative = 'editor',
+    width = math.min(width, vim.o.columns - 4),
+    height = height,
+    row = math.floor((vim.o.lines - height) / 2),
+    col = math.floor((vim.o.columns - width) / 2),
+    style = 'minimal',
+    border = 'rounded',
+  })
+  vim.wo[win].cursorline = true
+
+  local function map(lhs, callback)
+    vim.keymap.set('n', lhs, callback, { buffer = bufnr, nowait = true, silent = true })
+  end
+  map('q', function() vim.api.nvim_win_close(win, true) end)
+  map('<Esc>', function() vim.api.nvim_win_close(win, true) end)
+  for key in pairs(SORT_KEYS) do
+    map(key, function()
+      vim.api.nvim_win_close(win, true)
+      M.summary(key)
+    end)
+  end
+  map('<CR>', function()
+    local fn = functions[vim.api.nvim_win_get_cursor(win)[1] - 1]
+    vim.api.nvim_win_close(win, true)
+    if fn and fn.file ~= '' and vim.fn.filereadable(fn.file) == 1 then
+      vim.cmd('edit ' .. vim.fn.fnameescape(fn.file))
+    end
+  end)
+end
+
+-- Volver a dibujar los resultados al entrar en un buffer perfilado
+local function watch_buffers()
+  vim.cmd([[
+    augroup nvim_matlab_py_profile
+      autocmd!
+      autocmd BufWinEnter,TextChanged,InsertLeave * lua require('nvim-matlab-py.profile').render(tonumber(vim.fn.expand('<abuf>')))
+    augroup END
+  ]])
+end
+
+-- Ejecuta `run_code` con el perfilador activo. Opciones:
+--   mapping    traduce las líneas del archivo ejecutado a las del buffer de origen
+--   snapshots  contenido ejecutado de los buffers que no se leen del disco
+--   directory  directorio temporal que se borra al terminar en cualquier caso
+local function run(run_code, opts)
+  opts = opts or {}
+  define_highlights()
+  local result_path = vim.fn.tempname() .. '.json'
+  local matlab = table.concat({
+    'profile clear; profile on;',
+    run_code,
+    'profile off;',
+    'nvim_profile__ = profile(\'info\'); nvim_profile__ = nvim_profile__.FunctionTable; ' ..
+    'nvim_profile__ = rmfield(nvim_profile__, setdiff(fieldnames(nvim_profile__), ' ..
+    '{\'FunctionName\', \'FileName\', \'NumCalls\', \'TotalTime\', \'ExecutedLines\', \'Children\'})); ' ..
+    'nvim_fid__ = fopen(' .. code.matlab_string(result_path) .. ', \'w\'); ' ..
+    'fprintf(nvim_fid__, \'%s\', jsonencode(nvim_profile__)); fclose(nvim_fid__); ' ..
+    'clear nvim_profile__ nvim_fid__',
+  }, '\n')
+
+  vim.notify('Perfilando en MATLAB...', vim.log.levels.INFO)
+  return server.exec(matlab, {
+    on_done = function(result)
+      local ok, entries = pcall(function()
+        return vim.json.decode(table.concat(vim.fn.readfile(result_path), '\n'))
+      end)
+      vim.fn.delete(result_path)
+      if opts.directory then
+        vim.fn.delete(opts.directory, 'rf')
+      end
+      if result.status == 'failed' or not ok then
+        vim.notify('No se pudo obtener el perfil de MATLAB: ' .. (result.message or result.output or ''),
+          vim.log.levels.ERROR)
+        return
+      end
+
+      local functions, files = parse(as_list(entries))
+      M.functions = functions
+      if opts.mapping then
+        files = opts.mapping(files)
+      end
+      local snapshots = opts.snapshots or {}
+      for file, lines in pairs(files) do
+        local current = snapshots[file] or file_lines(file)
+        if current then
+          store(file, content_hash(current), lines)
+        end
+      end
+
+      watch_buffers()
+      for _, bufnr in ipairs(vim.api.nvim_list_bufs()) do
+        if vim.api.nvim_buf_is_loaded(bufnr) then
+          M.render(bufnr)
+        end
+      end
+      M.summary()
+    end,
+  })
+end
+
+-- Perfila la celda actual; la celda se escribe en un script temporal cuyas
+-- líneas se trasladan después a las del buffer. El script se llama a través
+-- del path para que la celda se ejecute en la carpeta actual de MATLAB.
+M.profile_cell = function()
+  local bufnr = vim.api.nvim_get_current_buf()
+  local first, _, lines = code.cell(bufnr)
+  local directory = vim.fn.tempname()
+  vim.fn.mkdir(directory, 'p')
+  local script_name = 'nvim_matlab_py_cell'
+  local script = directory .. '/' .. script_name .. '.m'
+  vim.fn.writefile(lines, script)
+  local script_key = normalize(script)
+  local target = buffer_key(bufnr)
+
+  local function mapping(files)
+    local cell_lines = files[script_key]
+    files[script_key] = nil
+    if cell_lines then
+      local mapped = files[target] or {}
+      for line, stats in pairs(cell_lines) do
+        mapped[line + first - 1] = stats
+      end
+      files[target] = mapped
+    end
+    return files
+  end
+
+  local quoted = code.matlab_string(directory)
+  local run_code = string.format(
+    'addpath(%s); try, %s; catch nvim_error__, rmpath(%s); rethrow(nvim_error__); end; rmpath(%s);',
+    quoted, script_name, quoted, quoted)
+  return run(run_code, {
+    mapping = mapping,
+    -- La celda sale del buffer, con o sin cambios guardados
+    snapshots = { [target] = vim.api.nvim_buf_get_lines(bufnr, 0, -1, false) },
+    directory = directory,
+  })
+end
+
+-- Perfila el archivo .m actual
+M.profile_file = function()
+  local path = vim.api.nvim_buf_get_name(0)
+  if not path:match('%.m$') then
+    vim.notify('El archivo actual no es un archivo MATLAB (.m)', vim.log.levels.ERROR)
+    return
+  end
+  -- MATLAB ejecuta el archivo en disco: guardar antes los cambios del buffer
+  vim.cmd('update')
+  return run(code.file(path))
+end
+
+return M
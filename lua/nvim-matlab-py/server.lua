@@ -0,0 +1,299 @@
+-- nvim-matlab-py: cliente del servidor MATLAB (matlab_server.py) sobre libuv
+
+local M = {}
+
+local uv = vim.uv or vim.loop
+
+-- Dirección del servidor según la configuración
+M.address = function()
+  return vim.g.matlab_server_host or '127.0.0.1', tonumber(vim.g.matlab_server_port) or 43889
+end
+
+-- Envía una petición JSON y llama a `callback(respuesta, error)` en el bucle
+-- principal con la primera línea que devuelva el servidor
+M.request = function(message, callback)
+  local host, port = M.address()
+  local client = uv.new_tcp()
+  local buffer = ''
+  local finished = false
+
+  local function finish(response, err)
+    if finished then
+      return
+    end
+    finished = true
+    if not client:is_closing() then
+      client:close()
+    end
+    vim.schedule(function()
+      callback(response, err)
+    end)
+  end
+
+  client:connect(host, port, function(connect_err)
+    if connect_err then
+      finish(nil, connect_err)
+      return
+    end
+    client:read_start(function(read_err, chunk)
+      if read_err then
+        finish(nil, read_err)
+      elseif chunk then
+        buffer = buffer .. chunk
+        local newline = buffer:find('\n', 1, true)
+        if newline then
+          local ok, response = pcall(vim.json.decode, buffer:sub(1, newline - 1))
+          finish(ok and response or nil, not ok and response or nil)
+        end
+      else
+        finish(nil, 'El servidor cerró la conexión')
+      end
+    end)
+    client:write(vim.json.encode(message) .. '\n')
+  end)
+end
+
+-- Comprueba si el servidor acepta conexiones; `callback(ok)` en el bucle principal
+M.probe = function(callback)
+  local host, port = M.address()
+  local client = uv.new_tcp()
+  client:connect(host, port, function(err)
+    client:close()
+    vim.schedule(function()
+      callback(err == nil)
+    end)
+  end)
+end
+
+-- Ruta de un script de python3/ del plugin
+local function script(name)
+  return vim.api.nvim_get_runtime_file('python3/' .. name, false)[1]
+end
+
+-- Directorio del historial persistente (ver python3/matlab_history.py), o
+-- nil si está desactivado
+M.history_directory = function()
+  if vim.g.matlab_history == 0 or vim.g.matlab_history == false then
+    return nil
+  end
+  local directory = vim.g.matlab_history_dir or (vim.fn.stdpath('data') .. '/nvim-matlab-py/history')
+  return vim.fn.expand(directory)
+end
+
+-- Job del servidor lanzado por esta instancia
+M.job = nil
+
+-- Lanza matlab_server.py (o el relay en modo remoto) como job de Neovim.
+-- Es el único punto de arranque: los comandos :Matlab* del lado Python
+-- también lo usan. Devuelve el id del job (<= 0 si falló).
+M.spawn = function()
+  local host, port = M.address()
+  local python = vim.g.python3_host_prog or 'python3'
+  local args
+  if vim.g.matlab_remote then
+    args = { python, script('matlab_remote.py'), 'relay', '--server', vim.g.matlab_remote,
+             '--host', host, '--port', tostring(port),
+             '--flush-window', tostring(vim.g.matlab_remote_flush_window or 50) }
+    if vim.g.matlab_remote_compress then
+      vim.list_extend(args, { '--compress', vim.g.matlab_remote_compress })
+    end
+  else
+    args = { python, script('matlab_server.py'), '--matlab', vim.g.matlab_executable or 'matlab',
+             '--host', host, '--port', tostring(port) }
+  end
+  local history = M.history_directory()
+  if history then
+    vim.list_extend(args, { '--history', history,
+                            '--history-days', tostring(vim.g.matlab_history_days or 30),
+                            '--history-size', tostring(vim.g.matlab_history_size or 256) })
+  end
+
+  local job = vim.fn.jobstart(args)
+  if job > 0 then
+    M.job = job
+    -- Detener al salir el servidor que haya iniciado esta instancia
+    vim.cmd([[
+      augroup nvim_matlab_py_server
+        autocmd!
+        autocmd VimLeavePre * lua require('nvim-matlab-py.server').shutdown(true)
+      augroup END
+    ]])
+  end
+  return job
+end
+
+-- Indica si el job lanzado por esta instancia sigue en ejecución
+M.running = function()
+  return M.job ~= nil and vim.fn.jobwait({ M.job }, 0)[1] == -1
+end
+
+-- Pide al servidor que se detenga y espera (bloqueando) a que termine el
+-- que lanzó esta instancia. Con `own_only` no detiene un servidor iniciado
+-- por otro Neovim.
+M.shutdown = function(own_only)
+  local own = M.running()
+  if own_only and not own then
+    return
+  end
+  local host, port = M.address()
+  local ok, channel = pcall(vim.fn.sockconnect, 'tcp', host .. ':' .. port, {})
+  if ok and channel > 0 then
+    vim.fn.chansend(channel, vim.json.encode({ type = 'shutdown' }) .. '\n')
+    vim.fn.chanclose(channel)
+  end
+  if own and vim.fn.jobwait({ M.job }, 10000)[1] == -1 then
+    vim.fn.jobstop(M.job)
+  end
+  M.job = nil
+end
+
+local waiting = nil
+
+-- Asegura que haya un servidor en ejecución, lanzándolo si hace falta;
+-- `callback(ok, error)` en el bucle principal
+M.ensure = function(callback)
+  M.probe(function(ok)
+    if ok then
+      return callback(true)
+    end
+    -- Varias peticiones simultáneas esperan al mismo arranque
+    if waiting then
+      table.insert(waiting, callback)
+      return
+    end
+    waiting = { callback }
+
+    local function finish(started, err)
+      local callbacks = waiting
+      waiting = nil
+      for _, cb in ipairs(callbacks) do
+        cb(started, err)
+      end
+    end
+
+    if M.spawn() <= 0 then
+      return finish(false, 'No se pudo iniciar el servidor MATLAB')
+    end
+    local attempts = 0
+    local function poll()
+      M.probe(function(ready)
+        attempts = attempts + 1
+        if ready then
+          finish(true)
+        elseif attempts >= 100 then
+          finish(false, 'El servidor MATLAB no respondió a tiempo')
+        else
+          vim.defer_fn(poll, 100)
+        end
+      end)
+    end
+    poll()
+  end)
+end
+
+-- Ejecuta código en MATLAB sin bloquear y sin pasar por el host de Python
+--
+-- opts.on_output(texto)   salida del trabajo a medida que llega
+-- opts.on_done(resultado) al terminar, con los campos:
+--   status   'success', 'error' (MATLAB informó un error), 'cancelled' o 'failed'
+--   error    true salvo que status sea 'success'
+--   message  descripción del fallo de comunicación, si lo hubo
+--   output   toda la salida capturada
+--   timings  { queued = ms en cola, elapsed = ms ejecutando, total = ms de ida y vuelta }
+--
+-- Devuelve un handle con `cancel()`: un trabajo que aún no empezó no se ejecuta;
+-- uno en curso sigue en MATLAB pero deja de reportarse.
+M.exec = function(code, opts)
+  opts = opts or {}
+  local handle = { done = false }
+  local client = nil
+  local chunks = {}
+  local pending = ''
+  local started = uv.hrtime()
+
+  local function finish(result)
+    if handle.done then
+      return
+    end
+    handle.done = true
+    if client and not client:is_closing() then
+      client:close()
+    end
+    result.output = table.concat(chunks)
+    result.error = result.status ~= 'success'
+    result.timings = {
+      queued = (tonumber(result.queued) or 0) * 1000,
+      elapsed = (tonumber(result.elapsed) or 0) * 1000,
+      total = (uv.hrtime() - started) / 1e6,
+    }
+    result.queued, result.elapsed = nil, nil
+    if opts.on_done then
+      vim.schedule(function()
+        opts.on_done(result)
+      end)
+    end
+  end
+
+  -- Cerrar la conexión basta para que el servidor cancele el trabajo
+  handle.cancel = function()
+    finish({ status = 'cancelled' })
+  end
+
+  local function receive(line)
+    local ok, message = pcall(vim.json.decode, line)
+    if not ok or type(message) ~= 'table' then
+      return
+    end
+    if message.type == 'output' then
+      table.insert(chunks, message.data)
+      if opts.on_output then
+        vim.schedule(function()
+          opts.on_output(message.data)
+        end)
+      end
+    elseif message.type == 'done' then
+      finish({
+        status = message.status,
+        message = message.message ~= vim.NIL and message.message or nil,
+        queued = message.queued,
+        elapsed = message.elapsed,
+      })
+    end
+  end
+
+  M.ensure(function(ok, err)
+    if handle.done then
+      return
+    end
+    if not ok then
+      return finish({ status = 'failed', message = err })
+    end
+    local host, port = M.address()
+    client = uv.new_tcp()
+    client:connect(host, port, function(connect_err)
+      if handle.done then
+        return
+      end
+      if connect_err then
+        return finish({ status = 'failed', message = connect_err })
+      end
+      client:read_start(function(read_err, chunk)
+        if read_err or not chunk then
+          return finish({ status = 'failed', message = read_err or 'El servidor cerró la conexión' })
+        end
+        pending = pending .. chunk
+        local newline = pending:find('\n', 1, true)
+        while newline and not handle.done do
+          receive(pending:sub(1, newline - 1))
+          pending = pending:sub(newline + 1)
+          newline = pending:find('\n', 1, true)
+        end
+      end)
+      client:write(vim.json.encode({ type = 'exec', code = code, stream = true }) .. '\n')
+    end)
+  end)
+
+  return handle
+end
+
+return M
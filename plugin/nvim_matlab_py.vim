@@ -3,34 +3,25 @@ if exists('g:loaded_nvim_matlab_py') || &cp
 endif
 let g:loaded_nvim_matlab_py = 1
 
-" Configuración predeterminada
-if !exists('g:matlab_executable')
-  if executable('matlab')
-    let g:matlab_executable = 'matlab'
-  else
-    echohl WarningMsg | echom "nvim-matlab-py: No se encontró MATLAB. Configure g:matlab_executable" | echohl None
-  endif
-endif
-
-" Inicializar el plugin Python
-function! s:init_python() abort
-  if has('nvim') && has('python3')
-    python3 import nvim_matlab_py
-  else
-    echohl ErrorMsg | echom "nvim-matlab-py requiere Neovim con soporte Python3" | echohl None
-    finish
-  endif
-endfunction
+" El lado Python se carga de forma diferida: los comandos son stubs en Lua que
+" importan nvim_matlab_py solo en el primer uso o al abrir un archivo MATLAB.
+" Así no se arranca el host de Python en sesiones que nunca tocan MATLAB.
 
 " Comandos
-command! -nargs=0 MatlabRun python3 nvim_matlab_py.run_file()
-command! -nargs=0 MatlabRunCell python3 nvim_matlab_py.run_cell()
-command! -nargs=0 MatlabRunLine python3 nvim_matlab_py.run_line()
-command! -range MatlabRunSelection python3 nvim_matlab_py.run_selection()
-command! -nargs=0 MatlabToggleFile python3 nvim_matlab_py.toggle_file()
-command! -nargs=0 MatlabStartServer python3 nvim_matlab_py.start_matlab_server()
-command! -nargs=0 MatlabStopServer python3 nvim_matlab_py.stop_matlab_server()
-command! -nargs=0 MatlabToggleWindow python3 nvim_matlab_py.toggle_matlab_window()
+command! -nargs=0 MatlabRun lua require('nvim-matlab-py.loader').call('run_file')
+command! -nargs=0 MatlabRunCell lua require('nvim-matlab-py.loader').call('run_cell')
+command! -nargs=0 MatlabRunLine lua require('nvim-matlab-py.loader').call('run_line')
+command! -range MatlabRunSelection lua require('nvim-matlab-py.loader').call('run_selection')
+command! -nargs=0 MatlabToggleFile lua require('nvim-matlab-py.loader').call('toggle_file')
+command! -nargs=0 MatlabStartServer lua require('nvim-matlab-py.loader').call('start_matlab_server')
+command! -nargs=0 MatlabStopServer lua require('nvim-matlab-py.loader').call('stop_matlab_server')
+command! -nargs=0 MatlabToggleWindow lua require('nvim-matlab-py.loader').call('toggle_matlab_window')
+command! -nargs=? MatlabHistory lua require('nvim-matlab-py.loader').call('matlab_history', <q-args>)
+" Perfilador (solo Lua)
+command! -nargs=0 MatlabProfileCell lua require('nvim-matlab-py.profile').profile_cell()
+command! -nargs=0 MatlabProfileFile lua require('nvim-matlab-py.profile').profile_file()
+command! -nargs=? MatlabProfileSummary lua require('nvim-matlab-py.profile').summary(<q-args> ~= '' and <q-args> or nil)
+command! -nargs=0 MatlabProfileClear lua require('nvim-matlab-py.profile').clear()
 
 " Mapeos de teclas predeterminados
 if !exists('g:matlab_disable_default_mappings') || !g:matlab_disable_default_mappings
@@ -44,5 +35,13 @@ if !exists('g:matlab_disable_default_mappings') || !g:matlab_disable_default_map
   nnoremap <silent> <leader>mw :MatlabToggleWindow<CR>
 endif
 
-" Inicializar el plugin
-call s:init_python()
+" Precargar el plugin Python la primera vez que se abre un archivo MATLAB,
+" sin bloquear la apertura del buffer
+augroup nvim_matlab_py
+  autocmd!
+  autocmd FileType matlab ++once lua vim.schedule(require('nvim-matlab-py.loader').load)
+  " Diagnósticos de checkcode (solo Lua, no carga el lado Python)
+  if has('nvim-0.6') && get(g:, 'matlab_lint', 1)
+    autocmd FileType matlab lua require('nvim-matlab-py.lint').attach(tonumber(vim.fn.expand('<abuf>')))
+  endif
+augroup END
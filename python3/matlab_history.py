@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Historial persistente de comandos y salida de MATLAB.
+
+El historial es un directorio con tres archivos de solo-añadir:
+
+- output.log: toda la salida de MATLAB, tal como llegó
+- commands.log: el texto de cada comando ejecutado
+- index.bin: un registro de tamaño fijo por comando con los rangos de bytes
+  de su texto y de su salida, las marcas de tiempo y el estado final
+
+Solo el servidor (o el relay) escribe; el editor abre el mismo directorio en
+modo lectura. El índice se consulta con mmap sin cargarlo entero, así que
+abrir un historial grande es inmediato, y las búsquedas recorren los archivos
+con mmap en lugar de leerlos en memoria.
+"""
+
+import bisect
+import contextlib
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+INDEX_MAGIC = b'NMPHIST1'
+# id, inicio y fin del comando, inicio y fin de la salida, enviado, iniciado,
+# terminado, estado
+INDEX_RECORD = struct.Struct('<QQQQQdddB7x')
+STATUSES = ('success', 'error', 'cancelled')
+
+# Longitud máxima de la línea mostrada para cada coincidencia
+SNIPPET_LENGTH = 200
+
+
+class HistoryEntry:
+    """Comando del historial (una entrada del índice)"""
+
+    def __init__(self, record):
+        (self.id, self.command_start, self.command_end, self.output_start, self.output_end,
+         self.submitted_at, self.started_at, self.finished_at, status) = record
+        self.status = STATUSES[status] if status < len(STATUSES) else 'error'
+
+    @property
+    def duration(self):
+        return self.finished_at - self.started_at
+
+
+class IndexView:
+    """Secuencia de solo lectura sobre los registros de index.bin
+
+    Admite bisect sobre un campo sin deserializar todo el índice.
+    """
+
+    def __init__(self, data, field=None, count=None):
+        self.data = data
+        self.field = field
+        self.count = (len(data) - len(INDEX_MAGIC)) // INDEX_RECORD.size if data else 0
+        if count is not None:
+            self.count = min(self.count, count)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        record = INDEX_RECORD.unpack_from(self.data, len(INDEX_MAGIC) + index * INDEX_RECORD.size)
+        return record[self.field] if self.field is not None else HistoryEntry(record)
+
+
+def _map(path):
+    """mmap de solo lectura de un archivo, o b'' si no existe o está vacío"""
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return b''
+
+
+def _copy_range(path, start, end, mode):
+    """Copia los bytes [start, end) de `path` a `path`.tmp"""
+    with open(path, 'rb') as source, open(path + '.tmp', mode) as target:
+        source.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = source.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            target.write(chunk)
+            remaining -= len(chunk)
+
+
+class HistoryStore:
+    """Historial de comandos guardado en `directory`
+
+    Con `writable`, `retention_days` y `max_bytes` (0 = sin límite) se
+    aplican al abrir y, en un hilo aparte, cada vez que el historial crece
+    por encima del límite; se descartan primero las entradas más antiguas.
+    """
+
+    def __init__(self, directory, writable=False, retention_days=0, max_bytes=0):
+        self.directory = directory
+        self.writable = writable
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.output_path = os.path.join(directory, 'output.log')
+        self.commands_path = os.path.join(directory, 'commands.log')
+        self.index_path = os.path.join(directory, 'index.bin')
+        self.lock = threading.Lock()
+        self.lock_file = None
+        # Una sola compactación a la vez; `compactor` es el hilo en curso
+        self.compact_lock = threading.Lock()
+        self.compactor = None
+        # Correspondencia entre los offsets de la salida de esta sesión y output.log
+        self.origin = None
+        self.segment_start = 0
+        self.stream_end = None
+        if writable:
+            self.open_writer()
+
+    # --- Escritura -----------------------------------------------------
+
+    def open_writer(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # Un solo proceso escribe en cada historial
+        self.lock_file = open(os.path.join(self.directory, 'lock'), 'w')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.lock_file.close()
+                raise RuntimeError(f"El historial {self.directory} está en uso por otro proceso")
+
+        # Descartar un registro incompleto que haya dejado un cierre abrupto
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                magic = f.read(len(INDEX_MAGIC))
+            if magic != INDEX_MAGIC:
+                os.replace(self.index_path, self.index_path + '.old')
+        if not os.path.exists(self.index_path):
+            with open(self.index_path, 'wb') as f:
+                f.write(INDEX_MAGIC)
+        size = os.path.getsize(self.index_path)
+        complete = len(INDEX_MAGIC) + (size - len(INDEX_MAGIC)) // INDEX_RECORD.size * INDEX_RECORD.size
+        if complete != size:
+            os.truncate(self.index_path, complete)
+
+        self.open_files()
+        self.compact()
+
+    def open_files(self):
+        self.output_file = open(self.output_path, 'ab', buffering=0)
+        self.commands_file = open(self.commands_path, 'ab', buffering=0)
+        self.index_file = open(self.index_path, 'ab', buffering=0)
+        self.output_size = self.output_file.seek(0, os.SEEK_END)
+        self.commands_size = self.commands_file.seek(0, os.SEEK_END)
+        index = _map(self.index_path)
+        view = IndexView(index)
+        self.next_id = view[-1].id + 1 if len(view) else 1
+        if isinstance(index, mmap.mmap):
+            index.close()
+
+    def close(self):
+        compactor = self.compactor
+        if compactor is not None:
+            compactor.join()
+        with self.lock:
+            for f in (self.output_file, self.commands_file, self.index_file, self.lock_file):
+                try:
+                    f.close()
+                except (AttributeError, OSError):
+                    pass
+
+    def append_output(self, offset, data):
+        """Añade salida de MATLAB que empieza en el offset `offset` de la sesión
+
+        Un offset que no continúa el anterior (MATLAB reiniciado o salida
+        perdida en modo remoto) abre un nuevo tramo en output.log.
+        """
+        with self.lock:
+            if offset != self.stream_end:
+                self.origin = self.output_size - offset
+                self.segment_start = self.output_size
+            self.output_file.write(data)
+            self.output_size += len(data)
+            self.stream_end = offset + len(data)
+
+    def record(self, command, start, end, submitted_at, started_at, finished_at, status):
+        """Guarda un comando cuya salida ocupa [start, end) en offsets de la sesión"""
+        with self.lock:
+            def locate(offset):
+                if offset is None or self.origin is None:
+                    return self.output_size
+                return min(max(offset + self.origin, self.segment_start), self.output_size)
+
+            output_start = locate(start)
+            output_end = max(locate(end), output_start)
+            data = command.encode('utf-8')
+            # Un salto de línea separa los comandos para que una búsqueda no una dos
+            self.commands_file.write(data + b'\n')
+            record = INDEX_RECORD.pack(
+                self.next_id, self.commands_size, self.commands_size + len(data), output_start, output_end,
+                submitted_at, started_at or finished_at, finished_at, STATUSES.index(status)
+            )
+            self.commands_size += len(data) + 1
+            self.index_file.write(record)
+            self.next_id += 1
+            due = self.max_bytes and self.output_size + self.commands_size > self.max_bytes * 1.25
+        # Quien registra es el hilo que lee la salida de MATLAB: no compactar aquí
+        if due:
+            self.compact_in_background()
+
+    def compact_in_background(self):
+        """Lanza `compact` en otro hilo si no hay una compactación en curso"""
+        with self.lock:
+            if self.compactor is not None and self.compactor.is_alive():
+                return
+            self.compactor = threading.Thread(target=self.compact, daemon=True)
+            self.compactor.start()
+
+    def compact(self):
+        """Descarta las entradas más antiguas que exceden la retención
+
+        Lo que se conserva se copia sin bloquear `append_output` ni `record`;
+        solo lo añadido durante la copia y el reemplazo de los archivos se
+        hacen con el bloqueo.
+        """
+        if not self.retention_days and not self.max_bytes:
+            return
+        with self.compact_lock:
+            with self.lock:
+                output_size, commands_size = self.output_size, self.commands_size
+                index_size = os.path.getsize(self.index_path)
+            index = _map(self.index_path)
+            try:
+                self.compact_copy(index, index_size, output_size, commands_size)
+            finally:
+                if isinstance(index, mmap.mmap):
+                    index.close()
+
+    def compact_copy(self, index, index_size, output_size, commands_size):
+        """Compacta el historial tal como era con esos tamaños de archivo"""
+        entries = IndexView(index, count=(index_size - len(INDEX_MAGIC)) // INDEX_RECORD.size)
+        if not len(entries):
+            return
+        cutoff = time.time() - self.retention_days * 86400 if self.retention_days else None
+        # Las entradas desde `first_kept` cumplen la retención
+        first_kept = len(entries)
+        while first_kept > 0:
+            entry = entries[first_kept - 1]
+            if cutoff is not None and entry.finished_at < cutoff:
+                break
+            if self.max_bytes and (output_size - entry.output_start
+                                   + commands_size - entry.command_start) > self.max_bytes:
+                break
+            first_kept -= 1
+        if first_kept == 0:
+            return
+
+        # Recortar hasta el inicio de la primera entrada conservada (o hasta el
+        # final de la última descartada si no queda ninguna)
+        if first_kept < len(entries):
+            first = entries[first_kept]
+            output_cut, commands_cut = first.output_start, first.command_start
+        else:
+            last = entries[first_kept - 1]
+            output_cut, commands_cut = last.output_end, last.command_end
+
+        def copy_records(target, data, start, count):
+            for position in range(count):
+                record = list(INDEX_RECORD.unpack_from(data, start + position * INDEX_RECORD.size))
+                record[1] -= commands_cut
+                record[2] -= commands_cut
+                record[3] = max(record[3] - output_cut, 0)
+                record[4] = max(record[4] - output_cut, 0)
+                target.write(INDEX_RECORD.pack(*record))
+
+        _copy_range(self.output_path, output_cut, output_size, 'wb')
+        _copy_range(self.commands_path, commands_cut, commands_size, 'wb')
+        with open(self.index_path + '.tmp', 'wb') as target:
+            target.write(INDEX_MAGIC)
+            copy_records(target, index, len(INDEX_MAGIC) + first_kept * INDEX_RECORD.size,
+                         len(entries) - first_kept)
+
+        with self.lock:
+            # Añadir lo registrado mientras se copiaba
+            _copy_range(self.output_path, output_size, self.output_size, 'ab')
+            _copy_range(self.commands_path, commands_size, self.commands_size, 'ab')
+            with open(self.index_path, 'rb') as source, open(self.index_path + '.tmp', 'ab') as target:
+                source.seek(index_size)
+                added = source.read()
+                copy_records(target, added, 0, len(added) // INDEX_RECORD.size)
+
+            for f in (self.output_file, self.commands_file, self.index_file):
+                f.close()
+            # Los lectores no mapean los archivos mientras se reemplazan (ver snapshot)
+            with self.replacing(exclusive=True):
+                os.replace(self.output_path + '.tmp', self.output_path)
+                os.replace(self.commands_path + '.tmp', self.commands_path)
+                os.replace(self.index_path + '.tmp', self.index_path)
+
+            if self.origin is not None:
+                self.origin -= output_cut
+                self.segment_start = max(self.segment_start - output_cut, 0)
+            self.open_files()
+
+    # --- Lectura -------------------------------------------------------
+
+    @contextlib.contextmanager
+    def replacing(self, exclusive=False):
+        """Bloqueo entre la compactación (exclusivo) y los lectores (compartido)"""
+        if fcntl is None or not os.path.isdir(self.directory):
+            yield
+            return
+        with open(os.path.join(self.directory, 'compact.lock'), 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def snapshot(self):
+        """Mapas coherentes de los tres archivos; el índice se lee primero para
+        que sus rangos estén dentro de los datos que se mapean después"""
+        with self.replacing():
+            index = _map(self.index_path)
+            return index, _map(self.commands_path), _map(self.output_path)
+
+    def __len__(self):
+        return len(IndexView(self.snapshot()[0]))
+
+    def latest(self, limit=100):
+        """Las `limit` entradas más recientes, de la más nueva a la más antigua"""
+        index, commands, _ = self.snapshot()
+        entries = IndexView(index)
+        result = []
+        for position in range(len(entries) - 1, max(len(entries) - limit, 0) - 1, -1):
+            entry = entries[position]
+            entry.command = commands[entry.command_start:entry.command_end].decode('utf-8', errors='replace')
+            result.append(entry)
+        return result
+
+    def get(self, entry_id):
+        """Entrada con identificador `entry_id` con su comando y su salida, o None"""
+        index, commands, output = self.snapshot()
+        position = bisect.bisect_left(IndexView(index, field=0), entry_id)
+        entries = IndexView(index)
+        if position >= len(entries) or entries[position].id != entry_id:
+            return None
+        entry = entries[position]
+        entry.command = commands[entry.command_start:entry.command_end].decode('utf-8', errors='replace')
+        entry.output = output[entry.output_start:entry.output_end].decode('utf-8', errors='replace')
+        return entry
+
+    def search(self, pattern, limit=200, ignore_case=None):
+        """Busca una expresión regular en los comandos y en su salida
+
+        Devuelve entradas (de la más nueva a la más antigua) con `match`
+        ('command' u 'output') y `line`, la primera línea que coincide. `^` y
+        `$` anclan al inicio y al final de cada línea. Si
+        `ignore_case` es None se ignoran mayúsculas salvo que el patrón las
+        contenga.
+        """
+        if ignore_case is None:
+            ignore_case = pattern == pattern.lower()
+        # ^ y $ anclan a cada línea, como en Vim, y no al archivo completo
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        regex = re.compile(pattern.encode('utf-8'), flags)
+        index, commands, output = self.snapshot()
+        entries = IndexView(index)
+        hits = {}
+        for data, match_kind, start_field, start_attr, end_attr in (
+                (commands, 'command', 1, 'command_start', 'command_end'),
+                (output, 'output', 3, 'output_start', 'output_end')):
+            starts = IndexView(index, field=start_field)
+            position = 0
+            while True:
+                match = regex.search(data, position)
+                if match is None:
+                    break
+                # Última entrada cuyo rango empieza antes de la coincidencia
+                entry_position = bisect.bisect_right(starts, match.start()) - 1
+                entry = entries[entry_position] if entry_position >= 0 else None
+                if entry is None or match.start() >= getattr(entry, end_attr):
+                    # Salida que no pertenece a ningún comando: seguir en la siguiente entrada
+                    if entry_position + 1 >= len(starts):
+                        break
+                    position = max(starts[entry_position + 1], match.start() + 1)
+                    continue
+                if entry.id not in hits:
+                    range_start, range_end = getattr(entry, start_attr), getattr(entry, end_attr)
+                    line_start = max(data.rfind(b'\n', range_start, match.start()) + 1, range_start)
+                    line_end = data.find(b'\n', match.start(), range_end)
+                    if line_end < 0:
+                        line_end = range_end
+                    line_end = min(line_end, line_start + SNIPPET_LENGTH)
+                    entry.match = match_kind
+                    entry.line = data[line_start:line_end].decode('utf-8', errors='replace')
+                    entry.command = commands[entry.command_start:entry.command_end].decode('utf-8', errors='replace')
+                    hits[entry.id] = entry
+                # Una coincidencia por entrada: continuar tras su rango
+                position = max(getattr(entry, end_attr), match.start() + 1)
+        return sorted(hits.values(), key=lambda entry: entry.id, reverse=True)[:limit]
+
+
+def add_history_arguments(parser):
+    """Opciones de historial comunes a matlab_server.py y al relay"""
+    parser.add_argument('--history', dest='history', default=None,
+                        help='Directorio del historial persistente de comandos (predeterminado: sin historial)')
+    parser.add_argument('--history-days', dest='history_days', type=float, default=30,
+                        help='Días que se conservan las entradas del historial (0 = sin límite, predeterminado: 30)')
+    parser.add_argument('--history-size', dest='history_size', type=float, default=256,
+                        help='MB máximos del historial (0 = sin límite, predeterminado: 256)')
+
+
+def open_history(directory, retention_days=30, max_megabytes=256, log=None):
+    """Abre el historial para escritura; devuelve None si no se pudo"""
+    if not directory:
+        return None
+    try:
+        return HistoryStore(directory, writable=True, retention_days=retention_days,
+                            max_bytes=int(max_megabytes * 1024 * 1024))
+    except (OSError, RuntimeError) as e:
+        if log:
+            log(f"Historial desactivado: {str(e)}")
+        return None
@@ -0,0 +1,733 @@
+#!/usr/bin/env python3
+"""
+Modo remoto para nvim-matlab-py.
+Permite que MATLAB se ejecute en un nodo de cómputo (con matlab_server.py)
+mientras el editor corre en otra máquina. El cliente mantiene una única
+conexión de larga duración por la que el servidor envía la salida de MATLAB
+en lotes comprimidos (zlib o zstd), con heartbeat y reconexión transparente
+que reanuda desde el último offset de salida confirmado.
+
+Subcomandos:
+  relay  Punto de acceso local para el editor que reenvía al servidor remoto
+  proxy  Proxy TCP que simula latencia, ancho de banda y cortes (pruebas)
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import codecs
+import heapq
+import socket
+import struct
+import argparse
+import tempfile
+import threading
+import itertools
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from matlab_history import add_history_arguments, open_history
+
+# Cabecera de cada frame: tipo (1 byte) y longitud del contenido
+FRAME_HEADER = struct.Struct('>cI')
+# Los frames de datos empiezan con el offset absoluto de la salida que contienen
+DATA_OFFSET = struct.Struct('>Q')
+
+CONTROL_FRAME = b'J'
+DATA_FRAME = b'D'
+
+# Tamaño máximo de un lote de salida antes de comprimirlo
+MAX_BATCH = 256 * 1024
+
+HEARTBEAT_INTERVAL = 5.0
+HEARTBEAT_TIMEOUT = 15.0
+
+
+def available_codecs():
+    """Códecs de compresión disponibles, por orden de preferencia"""
+    codecs = ['zlib', 'none']
+    if zstandard is not None:
+        codecs.insert(0, 'zstd')
+    return codecs
+
+
+def negotiate_codec(requested):
+    """Elige el primer códec pedido por el cliente que este lado soporte"""
+    if isinstance(requested, str):
+        requested = [requested]
+    supported = available_codecs()
+    for codec in requested or []:
+        if codec in supported:
+            return codec
+    return 'zlib'
+
+
+def compressor(codec):
+    """Devuelve la función de compresión del códec"""
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress
+    if codec == 'zlib':
+        return lambda data: zlib.compress(data, 6)
+    return bytes
+
+
+def decompressor(codec):
+    """Devuelve la función de descompresión del códec"""
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress
+    if codec == 'zlib':
+        return zlib.decompress
+    return bytes
+
+
+def send_frame(sock, lock, kind, payload):
+    """Envía un frame; `lock` serializa escritores concurrentes"""
+    with lock:
+        sock.sendall(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+
+def send_control(sock, lock, message):
+    """Envía un mensaje de control JSON"""
+    send_frame(sock, lock, CONTROL_FRAME, json.dumps(message).encode('utf-8'))
+
+
+def read_exact(stream, size):
+    """Lee exactamente `size` bytes o lanza ConnectionError"""
+    data = stream.read(size)
+    if data is None or len(data) < size:
+        raise ConnectionError("Conexión cerrada")
+    return data
+
+
+def read_frame(stream):
+    """Lee un frame y devuelve (tipo, contenido)"""
+    kind, length = FRAME_HEADER.unpack(read_exact(stream, FRAME_HEADER.size))
+    return kind, read_exact(stream, length)
+
+
+class OutputJournal:
+    """Salida de MATLAB direccionable por offset absoluto de bytes
+
+    Conserva como mucho `max_bytes`; lo más antiguo se descarta y `base`
+    avanza. Los clientes remotos reanudan leyendo desde su último offset
+    confirmado.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.base = 0
+        self.condition = threading.Condition()
+
+    @property
+    def end(self):
+        return self.base + len(self.data)
+
+    def append(self, chunk):
+        with self.condition:
+            self.data += chunk
+            overflow = len(self.data) - self.max_bytes
+            if overflow > 0:
+                del self.data[:overflow]
+                self.base += overflow
+            self.condition.notify_all()
+            return self.end
+
+    def read(self, offset, limit=MAX_BATCH):
+        """Devuelve (offset, datos) desde `offset`, ajustado a lo conservado"""
+        with self.condition:
+            offset = max(offset, self.base)
+            start = offset - self.base
+            return offset, bytes(self.data[start:start + limit])
+
+    def reset(self, offset):
+        """Descarta lo conservado y continúa desde `offset`"""
+        with self.condition:
+            self.data = bytearray()
+            self.base = offset
+
+    def wake(self):
+        """Despierta a quien espera en `wait` aunque no haya datos nuevos"""
+        with self.condition:
+            self.condition.notify_all()
+
+    def wait(self, offset, timeout):
+        """Espera hasta que haya datos más allá de `offset`"""
+        with self.condition:
+            if self.end <= offset:
+                self.condition.wait(timeout)
+            return self.end > offset
+
+
+def stream_job(sock, journal, job, cancel):
+    """Envía por `sock` la salida de un trabajo a medida que se produce
+
+    Manda mensajes `output` con el texto del rango [start_offset,
+    end_offset) del trabajo y, al terminar, un `done` con su estado y
+    tiempos. Si el cliente envía `cancel` o cierra la conexión se llama a
+    `cancel(job)` (que solo tiene efecto si aún no empezó) y se deja de
+    enviar.
+    """
+    cancelled = threading.Event()
+    sock.settimeout(None)
+
+    def watch():
+        try:
+            for line in sock.makefile('rb'):
+                if json.loads(line.decode('utf-8')).get("type") == "cancel":
+                    break
+        except (OSError, ValueError):
+            pass
+        if not job.done.is_set():
+            cancelled.set()
+            cancel(job)
+            journal.wake()
+
+    threading.Thread(target=watch, daemon=True).start()
+
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    sent = None
+    try:
+        while not cancelled.is_set():
+            if job.start_offset is not None:
+                if sent is None:
+                    sent = job.start_offset
+                while True:
+                    offset, data = journal.read(sent)
+                    # end_offset se fija antes de que llegue salida del siguiente trabajo
+                    end = job.end_offset
+                    if end is not None:
+                        data = data[:max(end - offset, 0)]
+                    if not data:
+                        break
+                    sent = offset + len(data)
+                    text = decoder.decode(data)
+                    if text:
+                        message = {"type": "output", "data": text}
+                        sock.sendall((json.dumps(message) + "\n").encode('utf-8'))
+            if job.done.is_set() and (job.end_offset is None or sent is None or sent >= job.end_offset):
+                break
+            journal.wait(journal.end if sent is None else sent, 0.5)
+        if cancelled.is_set() and not job.done.is_set():
+            summary = {"status": "cancelled", "queued": 0.0, "elapsed": 0.0}
+        else:
+            summary = job.summary()
+        sock.sendall((json.dumps(dict(summary, type="done")) + "\n").encode('utf-8'))
+    except OSError:
+        pass
+
+
+class RelayJob:
+    """Trabajo remoto visto desde el relay, actualizado por los eventos del servidor"""
+
+    def __init__(self, code=''):
+        self.code = code
+        self.start_offset = None
+        self.end_offset = None
+        self.result = None
+        self.done = threading.Event()
+
+    def summary(self):
+        return self.result
+
+
+class RemoteClient:
+    """Conexión de larga duración con un matlab_server.py remoto
+
+    Entrega la salida por `on_output(offset, datos)` y los eventos de control
+    (fin de trabajo, resultado de análisis) por `on_event(mensaje)`.
+    Si la conexión cae, reconecta con espera exponencial, reanuda desde
+    el último offset confirmado y reenvía las peticiones sin respuesta. Si
+    el servidor se reinició, esas peticiones terminan con estado 'failed'.
+    """
+
+    def __init__(self, host, port, codecs=None, flush_window=50, on_output=None, on_event=None, log=None):
+        self.host = host
+        self.port = port
+        self.codecs = codecs or available_codecs()
+        self.flush_window = flush_window
+        self.on_output = on_output or (lambda offset, data: None)
+        self.on_event = on_event or (lambda message: None)
+        self.log = log or (lambda message: None)
+        self.instance = None
+        self.offset = 0
+        self.acked = 0
+        self.pending = {}
+        self.request_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.sock = None
+        self.connected = threading.Event()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        thread = threading.Thread(target=self.connection_loop, daemon=True)
+        thread.start()
+
+    def stop(self):
+        self.running = False
+        self.close_socket()
+
+    def close_socket(self):
+        self.connected.clear()
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def request(self, message):
+        """Envía una petición (exec, lint, ...) y devuelve su id
+
+        La petición queda pendiente hasta recibir su respuesta, de modo que
+        se reenvía tras una reconexión; el servidor ignora los duplicados.
+        """
+        with self.lock:
+            message = dict(message, rid=f"{os.getpid()}-{next(self.request_ids)}")
+            self.pending[message["rid"]] = message
+        self.send(message)
+        return message["rid"]
+
+    def send(self, message):
+        sock = self.sock
+        if sock is None or not self.connected.is_set():
+            return False
+        try:
+            send_control(sock, self.send_lock, message)
+            return True
+        except OSError:
+            self.close_socket()
+            return False
+
+    def connection_loop(self):
+        delay = 0.5
+        while self.running:
+            try:
+                self.connect()
+                delay = 0.5
+                self.read_loop()
+            except (OSError, ConnectionError, ValueError) as e:
+                self.log(f"Conexión remota perdida: {str(e)}")
+            self.close_socket()
+            if self.running:
+                time.sleep(delay)
+                delay = min(delay * 2, 8.0)
+
+    def connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=HEARTBEAT_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        hello = {
+            "type": "session",
+            "instance": self.instance,
+            "ack": self.acked,
+            "compress": self.codecs,
+            "flush_window": self.flush_window,
+        }
+        sock.sendall((json.dumps(hello) + "\n").encode('utf-8'))
+        self.stream = sock.makefile('rb')
+        reply = json.loads(self.stream.readline().decode('utf-8'))
+        if reply.get("status") != "success":
+            raise ConnectionError(reply.get("message", "Sesión rechazada"))
+
+        lost = []
+        if reply["instance"] != self.instance:
+            # Servidor nuevo (o reiniciado): sus offsets empiezan de cero
+            if self.instance is not None:
+                # Lo pendiente se pidió al servidor anterior: no repetirlo en este
+                with self.lock:
+                    lost = list(self.pending)
+                    self.pending.clear()
+            self.instance = reply["instance"]
+            self.offset = self.acked = reply["offset"]
+        self.decompress = decompressor(reply["compress"])
+        self.sock = sock
+        self.connected.set()
+        self.log(f"Conectado a {self.host}:{self.port} ({reply['compress']}, offset {reply['offset']})")
+
+        for rid in lost:
+            self.on_event({"type": "done", "rid": rid, "status": "failed",
+                           "message": "El servidor remoto se reinició"})
+
+        # Reenviar lo que no obtuvo respuesta antes del corte
+        with self.lock:
+            pending = list(self.pending.values())
+        for message in pending:
+            self.send(message)
+
+    def read_loop(self):
+        last_ping = time.time()
+        while self.running:
+            try:
+                kind, payload = read_frame(self.stream)
+            except socket.timeout:
+                raise ConnectionError("Sin heartbeat del servidor")
+            if kind == DATA_FRAME:
+                (offset,) = DATA_OFFSET.unpack(payload[:DATA_OFFSET.size])
+                data = self.decompress(payload[DATA_OFFSET.size:])
+                self.receive_output(offset, data)
+            elif kind == CONTROL_FRAME:
+                self.receive_control(json.loads(payload.decode('utf-8')))
+            if time.time() - last_ping >= HEARTBEAT_INTERVAL:
+                self.send({"type": "ping"})
+                last_ping = time.time()
+
+    def receive_output(self, offset, data):
+        end = offset + len(data)
+        if end <= self.offset:
+            return  # Reenvío de algo ya recibido
+        if offset < self.offset:
+            data = data[self.offset - offset:]
+            offset = self.offset
+        self.offset = end
+        self.on_output(offset, data)
+        # Confirmar lo recibido para que una reconexión reanude desde aquí
+        if self.send({"type": "ack", "offset": self.offset}):
+            self.acked = self.offset
+
+    def receive_control(self, message):
+        kind = message.get("type")
+        if kind == "ping":
+            self.send({"type": "pong"})
+            return
+        if kind == "pong":
+            return
+        # `started` es solo un aviso: la petición sigue pendiente hasta su respuesta final
+        rid = message.get("rid")
+        if rid is not None and kind != "started":
+            with self.lock:
+                self.pending.pop(rid, None)
+        self.on_event(message)
+
+
+class LocalRelay:
+    """Punto de acceso local que habla el mismo protocolo que matlab_server.py
+
+    El editor se conecta aquí como si fuera un servidor local; los comandos
+    y análisis viajan al servidor remoto por una única conexión.
+    """
+
+    def __init__(self, remote_host, remote_port, port=43889, host='127.0.0.1', codecs=None, flush_window=50,
+                 history=None, history_days=30, history_size=256):
+        self.host = host
+        self.port = port
+        self.running = False
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+        # Copia local de la salida con los mismos offsets que el servidor
+        self.journal = OutputJournal()
+        self.jobs = {}
+        self.waiting = {}
+        self.waiting_lock = threading.Lock()
+        self.log_file = os.path.join(tempfile.gettempdir(), 'nvim_matlab_py_relay.log')
+        self.client = RemoteClient(
+            remote_host, remote_port, codecs=codecs, flush_window=flush_window,
+            on_output=self.receive_output, on_event=self.deliver, log=self.log
+        )
+        # El historial se guarda en la máquina del editor (ver matlab_history.py)
+        self.history = open_history(history, history_days, history_size, log=self.log)
+
+    def log(self, message):
+        """Escribe un mensaje en el archivo de log"""
+        with open(self.log_file, 'a') as f:
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{timestamp}] {message}\n")
+
+    def receive_output(self, offset, data):
+        if offset != self.journal.end:
+            if offset < self.journal.end:
+                # Los offsets volvieron atrás: es otro servidor
+                self.broadcast("\n[nvim-matlab-py: el servidor remoto se reinició]\n")
+            elif self.journal.end:
+                self.broadcast(f"\n[nvim-matlab-py: se perdieron {offset - self.journal.end} bytes de salida]\n")
+            self.journal.reset(offset)
+        if self.history is not None:
+            self.history.append_output(offset, data)
+        self.journal.append(data)
+        self.broadcast(data.decode('utf-8', errors='replace'))
+
+    def broadcast(self, text):
+        message = (json.dumps({"type": "output", "data": text}) + "\n").encode('utf-8')
+        with self.subscribers_lock:
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.sendall(message)
+                except OSError:
+                    self.subscribers.remove(subscriber)
+
+    def deliver(self, message):
+        """Entrega una respuesta remota a quien la espera localmente"""
+        rid = message.get("rid")
+        with self.waiting_lock:
+            job = self.jobs.get(rid)
+            if job is not None and message.get("type") == "done":
+                del self.jobs[rid]
+            waiter = self.waiting.pop(rid, None) if job is None else None
+        if job is not None:
+            if message.get("type") == "started":
+                job.start_offset = message["start"]
+            elif message.get("type") == "done":
+                job.start_offset = message.get("start")
+                job.end_offset = message.get("end")
+                job.result = {key: message.get(key) for key in ("status", "queued", "elapsed")}
+                if "message" in message:
+                    job.result["message"] = message["message"]
+                job.done.set()
+                self.record_history(job)
+            self.journal.wake()
+        elif waiter is not None:
+            waiter["response"] = message
+            waiter["event"].set()
+
+    def record_history(self, job):
+        """Guarda en el historial un trabajo remoto que llegó a ejecutarse"""
+        if self.history is None or job.start_offset is None:
+            return
+        finished_at = time.time()
+        started_at = finished_at - (job.result.get("elapsed") or 0)
+        submitted_at = started_at - (job.result.get("queued") or 0)
+        try:
+            self.history.record(job.code, job.start_offset, job.end_offset, submitted_at,
+                                started_at, finished_at, job.result.get("status") or "error")
+        except OSError as e:
+            self.log(f"Error al guardar el historial: {str(e)}")
+
+    def forward(self, message, timeout=None):
+        """Envía una petición remota y, si `timeout`, espera su respuesta"""
+        if timeout is None:
+            self.client.request(message)
+            return {"status": "success"}
+        waiter = {"event": threading.Event(), "response": None}
+        with self.waiting_lock:
+            rid = self.client.request(message)
+            self.waiting[rid] = waiter
+        if not waiter["event"].wait(timeout):
+            with self.waiting_lock:
+                self.waiting.pop(rid, None)
+            return {"status": "error", "message": "Tiempo de espera agotado"}
+        return waiter["response"]
+
+    def run(self):
+        self.client.start()
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.port))
+        server.listen(5)
+        server.settimeout(1.0)
+        self.running = True
+        self.log(f"Relay escuchando en {self.host}:{self.port}")
+        while self.running:
+            try:
+                client_socket, _ = server.accept()
+            except socket.timeout:
+                continue
+            threading.Thread(target=self.handle_client, args=(client_socket,), daemon=True).start()
+        self.client.stop()
+        server.close()
+        if self.history is not None:
+            self.history.close()
+        self.log("Relay detenido")
+
+    def handle_client(self, client_socket):
+        keep_open = False
+        try:
+            line = client_socket.makefile('rb').readline().decode('utf-8')
+            if not line:
+                return
+            request = None
+            if line.lstrip().startswith('{'):
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    pass
+            if not isinstance(request, dict) or "type" not in request:
+                request = {"type": "exec", "code": line.strip()}
+
+            kind = request["type"]
+            if kind == "exec":
+                # Seguir también los trabajos sin stream para el historial
+                job = RelayJob(request.get("code", ""))
+                with self.waiting_lock:
+                    rid = self.client.request({"type": "exec", "code": job.code})
+                    self.jobs[rid] = job
+                if request.get("stream"):
+                    stream_job(client_socket, self.journal, job,
+                               lambda job: self.client.send({"type": "cancel", "target": rid}))
+                    return
+                response = {"status": "success"}
+            elif kind == "lint":
+                # El servidor remoto no ve los archivos locales: enviar el contenido
+                path = request.get("path", "")
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    content = f.read()
+                response = self.forward(
+                    {"type": "lint", "name": os.path.basename(path), "content": content, "key": request.get("key")},
+                    timeout=60.0
+                )
+            elif kind == "subscribe":
+                client_socket.settimeout(None)
+                response = {"status": "success"}
+                with self.subscribers_lock:
+                    self.subscribers.append(client_socket)
+                keep_open = True
+            elif kind == "shutdown":
+                self.forward({"type": "shutdown"})
+                self.running = False
+                response = {"status": "success"}
+            else:
+                response = {"status": "error", "message": f"Petición desconocida: {kind}"}
+            client_socket.sendall((json.dumps(response) + "\n").encode('utf-8'))
+        except Exception as e:
+            self.log(f"Error al manejar cliente: {str(e)}")
+        finally:
+            if not keep_open:
+                client_socket.close()
+
+
+class ThrottledProxy:
+    """Proxy TCP que simula un enlace lento para probar el modo remoto en local
+
+    Retrasa cada fragmento `latency` ms, limita el caudal a `bandwidth`
+    KB/s por sentido y, si `reset_every` > 0, corta las conexiones cada
+    tantos segundos para forzar reconexiones.
+    """
+
+    def __init__(self, listen_port, target_host, target_port, latency=0, bandwidth=0, reset_every=0):
+        self.listen_port = listen_port
+        self.target = (target_host, target_port)
+        self.latency = latency / 1000.0
+        self.bandwidth = bandwidth * 1024
+        self.reset_every = reset_every
+
+    def run(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('127.0.0.1', self.listen_port))
+        server.listen(5)
+        while True:
+            client_socket, _ = server.accept()
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError:
+                client_socket.close()
+                continue
+            pair = (client_socket, upstream)
+            threading.Thread(target=self.pump, args=(client_socket, upstream, pair), daemon=True).start()
+            threading.Thread(target=self.pump, args=(upstream, client_socket, pair), daemon=True).start()
+            if self.reset_every > 0:
+                timer = threading.Timer(self.reset_every, self.reset, args=(pair,))
+                timer.daemon = True
+                timer.start()
+
+    def reset(self, pair):
+        for sock in pair:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+            except OSError:
+                pass
+
+    def pump(self, source, destination, pair):
+        """Copia de `source` a `destination` aplicando latencia y caudal"""
+        schedule = []
+        condition = threading.Condition()
+        sequence = itertools.count()
+        closed = threading.Event()
+
+        def sender():
+            while True:
+                with condition:
+                    while not schedule and not closed.is_set():
+                        condition.wait()
+                    if not schedule:
+                        break
+                    due, _, chunk = schedule[0]
+                    delay = due - time.time()
+                    if delay > 0:
+                        condition.wait(delay)
+                        continue
+                    heapq.heappop(schedule)
+                try:
+                    destination.sendall(chunk)
+                except OSError:
+                    break
+            self.reset(pair)
+
+        threading.Thread(target=sender, daemon=True).start()
+        available_at = time.time()
+        while True:
+            try:
+                chunk = source.recv(16384)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                break
+            now = time.time()
+            # El caudal se modela como un enlace que se libera al terminar de transmitir
+            transmit = len(chunk) / self.bandwidth if self.bandwidth else 0
+            available_at = max(available_at, now) + transmit
+            with condition:
+                heapq.heappush(schedule, (available_at + self.latency, next(sequence), chunk))
+                condition.notify()
+        with condition:
+            closed.set()
+            condition.notify()
+
+
+def parse_address(value, default_port=43889):
+    host, _, port = value.rpartition(':')
+    if not host:
+        return value, default_port
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Modo remoto de nvim-matlab-py')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    relay = subparsers.add_parser('relay', help='Punto de acceso local para un servidor remoto')
+    relay.add_argument('--server', required=True, help='Servidor remoto host:puerto')
+    relay.add_argument('--port', type=int, default=43889,
+                       help='Puerto local para el editor (predeterminado: 43889)')
+    relay.add_argument('--host', default='127.0.0.1', help='Host local (predeterminado: 127.0.0.1)')
+    relay.add_argument('--compress', default=','.join(available_codecs()),
+                       help='Códecs aceptados por orden de preferencia (predeterminado: %(default)s)')
+    relay.add_argument('--flush-window', type=int, default=50,
+                       help='Milisegundos que el servidor agrupa la salida antes de enviarla (predeterminado: 50)')
+    add_history_arguments(relay)
+
+    proxy = subparsers.add_parser('proxy', help='Proxy que simula un enlace lento (pruebas en loopback)')
+    proxy.add_argument('--listen', type=int, required=True, help='Puerto local de escucha')
+    proxy.add_argument('--target', required=True, help='Destino host:puerto')
+    proxy.add_argument('--latency', type=float, default=0, help='Latencia por sentido en ms')
+    proxy.add_argument('--bandwidth', type=float, default=0, help='Caudal por sentido en KB/s (0 = sin límite)')
+    proxy.add_argument('--reset-every', type=float, default=0,
+                       help='Cortar las conexiones cada N segundos (0 = nunca)')
+
+    args = parser.parse_args()
+
+    if args.command == 'relay':
+        remote_host, remote_port = parse_address(args.server)
+        LocalRelay(
+            remote_host, remote_port, port=args.port, host=args.host,
+            codecs=args.compress.split(','), flush_window=args.flush_window,
+            history=args.history, history_days=args.history_days, history_size=args.history_size
+        ).run()
+    else:
+        target_host, target_port = parse_address(args.target)
+        ThrottledProxy(
+            args.listen, target_host, target_port,
+            latency=args.latency, bandwidth=args.bandwidth, reset_every=args.reset_every
+        ).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
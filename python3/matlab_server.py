@@ -6,6 +6,7 @@ La comunicación con el editor se realiza a través de un socket.
 """
 
 import os
+import re
 import sys
 import socket
 import subprocess
@@ -16,15 +17,216 @@ import tempfile
 import argparse
 import signal
 import atexit
+import uuid
+from collections import deque
+
+from matlab_history import add_history_arguments, open_history
+from matlab_remote import (
+    CONTROL_FRAME, DATA_FRAME, DATA_OFFSET, HEARTBEAT_INTERVAL, HEARTBEAT_TIMEOUT,
+    OutputJournal, compressor, negotiate_codec, read_frame, send_control, send_frame, stream_job,
+)
+
+# Marca que MATLAB imprime al terminar cada trabajo: <<nvim-matlab-py:id:error>>
+SENTINEL_PATTERN = re.compile(r'<<nvim-matlab-py:(\d+):([01])>>')
+
+# Tiempo máximo que un cliente espera el resultado de un análisis con checkcode
+LINT_TIMEOUT = 30.0
+
+# Trabajos remotos recordados para ignorar peticiones reenviadas tras reconectar
+REMOTE_JOBS_LIMIT = 1000
+# Eventos de trabajos remotos conservados para repetirlos al reanudar una sesión
+REMOTE_EVENTS_LIMIT = 10000
+
+
+def matlab_string(value):
+    """Escapa un texto para usarlo como literal de cadena de MATLAB"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+class MatlabJob:
+    """Trabajo enviado a la sesión de MATLAB"""
+
+    def __init__(self, job_id, code, key=None):
+        self.id = job_id
+        self.code = code
+        self.key = key
+        self.background = False
+        self.error = False
+        self.stale = False
+        # Rango [start_offset, end_offset) de la salida de MATLAB que produjo
+        self.start_offset = None
+        self.end_offset = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.on_start = None
+        self.on_done = None
+        # Petición remota que originó el trabajo, si la hay
+        self.rid = None
+        self.done = threading.Event()
+
+    def start(self, offset):
+        self.start_offset = offset
+        self.started_at = time.time()
+        if self.on_start:
+            self.on_start(self)
+
+    def finish(self, error=False, stale=False):
+        self.error = error
+        self.stale = stale
+        self.finished_at = time.time()
+        self.done.set()
+        if self.on_done:
+            self.on_done(self)
+
+    def summary(self):
+        """Estado final y tiempos (en segundos) del trabajo"""
+        if self.stale:
+            status = "cancelled"
+        else:
+            status = "error" if self.error else "success"
+        started = self.started_at or self.finished_at
+        return {
+            "status": status,
+            "queued": started - self.submitted_at,
+            "elapsed": self.finished_at - started,
+        }
+
+
+class RemoteSession:
+    """Conexión remota de larga duración (ver matlab_remote.py)
+
+    Recibe peticiones como frames de control y envía la salida de MATLAB
+    en lotes comprimidos, agrupando lo producido durante `flush_window`
+    segundos. Si la conexión queda inactiva envía pings; el cliente que
+    no responde en HEARTBEAT_TIMEOUT se desconecta.
+    """
+
+    def __init__(self, server, sock, codec, flush_window, offset):
+        self.server = server
+        self.sock = sock
+        self.compress = compressor(codec)
+        self.flush_window = flush_window
+        self.sent = offset
+        self.acked = offset
+        self.send_lock = threading.Lock()
+        self.events = deque()
+        self.alive = True
+
+    def queue(self, message):
+        """Encola un mensaje de control y despierta al escritor
+
+        Se guarda junto al offset de la salida en ese momento: el escritor lo
+        envía justo después de esa salida.
+        """
+        self.events.append((self.server.journal.end, message))
+        self.server.journal.wake()
+
+    def run(self):
+        writer = threading.Thread(target=self.write_loop, daemon=True)
+        writer.start()
+        stream = self.sock.makefile('rb')
+        try:
+            while self.alive and self.server.running:
+                kind, payload = read_frame(stream)
+                if kind == CONTROL_FRAME:
+                    self.handle_message(json.loads(payload.decode('utf-8')))
+        except (OSError, ConnectionError, ValueError) as e:
+            self.server.log(f"Sesión remota cerrada (offset confirmado {self.acked}): {str(e)}")
+        finally:
+            self.alive = False
+            self.server.detach_session(self)
+            self.server.journal.wake()
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def handle_message(self, message):
+        kind = message.get("type")
+        if kind == "ping":
+            self.queue({"type": "pong"})
+        elif kind == "ack":
+            self.acked = max(self.acked, int(message.get("offset", 0)))
+        elif kind == "exec":
+            self.server.remote_exec(message)
+        elif kind == "cancel":
+            self.server.remote_cancel(message.get("target"))
+        elif kind == "lint":
+            # El análisis espera a MATLAB: no bloquear la lectura de la sesión
+            def lint():
+                response = self.server.lint_content(message.get("name", "untitled.m"),
+                                                    message.get("content", ""), message.get("key"))
+                self.queue(dict(response, type="lint", rid=message.get("rid")))
+            threading.Thread(target=lint, daemon=True).start()
+        elif kind == "shutdown":
+            self.queue({"type": "shutdown", "rid": message.get("rid"), "status": "success"})
+            self.server.running = False
+
+    def flush(self):
+        """Envía la salida pendiente intercalando cada evento en su offset"""
+        flushed = False
+        while True:
+            self.sent = max(self.sent, self.server.journal.base)
+            offset, data = self.server.journal.read(self.sent)
+            # Mirar los eventos después de leer: un evento siempre se encola
+            # antes que la salida posterior a su offset
+            if self.events:
+                data = data[:max(self.events[0][0] - offset, 0)]
+            if data:
+                payload = DATA_OFFSET.pack(offset) + self.compress(data)
+                send_frame(self.sock, self.send_lock, DATA_FRAME, payload)
+                self.sent = offset + len(data)
+            elif self.events:
+                send_control(self.sock, self.send_lock, self.events.popleft()[1])
+            else:
+                return flushed
+            flushed = True
+
+    def write_loop(self):
+        last_sent = time.time()
+        try:
+            while self.alive and self.server.running:
+                if self.server.journal.wait(self.sent, HEARTBEAT_INTERVAL):
+                    # Agrupar la salida que llegue durante la ventana
+                    time.sleep(self.flush_window)
+                if self.flush():
+                    last_sent = time.time()
+                if time.time() - last_sent >= HEARTBEAT_INTERVAL:
+                    send_control(self.sock, self.send_lock, {"type": "ping"})
+                    last_sent = time.time()
+        except OSError as e:
+            self.server.log(f"Error al escribir en la sesión remota: {str(e)}")
+            self.alive = False
+
 
 class MatlabServer:
-    def __init__(self, matlab_executable, port=43889, host='127.0.0.1'):
+    def __init__(self, matlab_executable, port=43889, host='127.0.0.1', flush_window=50, replay_buffer=8,
+                 history=None, history_days=30, history_size=256):
         self.matlab_executable = matlab_executable
         self.port = port
         self.host = host
         self.socket = None
         self.matlab_process = None
         self.running = False
+        self.stdin_lock = threading.Lock()
+        # Los comandos interactivos siempre se despachan antes que los de fondo
+        self.queue_condition = threading.Condition()
+        self.interactive_queue = deque()
+        self.background_queue = deque()
+        self.inflight = deque()
+        self.next_job_id = 1
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+        # Salida de MATLAB por offset, para las sesiones remotas
+        self.instance = uuid.uuid4().hex
+        self.journal = OutputJournal(replay_buffer * 1024 * 1024)
+        self.flush_window = flush_window
+        self.remote_jobs = {}
+        self.remote_jobs_lock = threading.Lock()
+        self.remote_sessions = []
+        self.remote_events = deque()
+        self.remote_events_lock = threading.Lock()
         self.log_file = os.path.join(tempfile.gettempdir(), 'nvim_matlab_py_server.log')
         
         # Configurar manejo de señales para cierre limpio
@@ -35,6 +237,9 @@ class MatlabServer:
         # Iniciar el archivo de log
         with open(self.log_file, 'w') as f:
             f.write(f"Servidor MATLAB iniciado: puerto={port}, matlab={matlab_executable}\n")
+
+        # Historial persistente de comandos y salida (ver matlab_history.py)
+        self.history = open_history(history, history_days, history_size, log=self.log)
     
     def log(self, message):
         """Escribe un mensaje en el archivo de log"""
@@ -67,16 +272,285 @@ class MatlabServer:
     
     def monitor_matlab_output(self):
         """Monitorea la salida de MATLAB"""
-        while self.matlab_process and self.running:
+        # No depende de self.running: el monitor arranca antes que el socket y
+        # termina cuando MATLAB cierra su salida
+        while self.matlab_process:
             try:
                 line = self.matlab_process.stdout.readline()
                 if not line:
                     break
-                self.log(f"MATLAB: {line.strip()}")
+                match = SENTINEL_PATTERN.search(line)
+                if match:
+                    # Conservar lo que MATLAB imprimió antes de la marca en la misma línea
+                    prefix = line[:match.start()]
+                    if prefix.strip(' >'):
+                        self.publish(prefix + '\n')
+                    self.job_finished(int(match.group(1)), match.group(2) == '1')
+                    continue
+                self.publish(line)
             except Exception as e:
                 self.log(f"Error al leer salida de MATLAB: {str(e)}")
                 break
     
+    def publish(self, text):
+        """Registra una línea de salida de MATLAB y la reenvía a los clientes"""
+        self.log(f"MATLAB: {text.strip()}")
+        data = text.encode('utf-8')
+        if self.history is not None:
+            self.history.append_output(self.journal.end, data)
+        self.journal.append(data)
+        self.broadcast(text)
+
+    def submit(self, code, background=False, key=None):
+        """Encola código para MATLAB y devuelve el trabajo creado
+
+        Los trabajos de fondo (p. ej. checkcode) solo se envían cuando MATLAB
+        está ocioso y no hay comandos interactivos pendientes. Un trabajo de
+        fondo con la misma `key` que otro aún en cola lo reemplaza.
+        """
+        with self.queue_condition:
+            job = MatlabJob(self.next_job_id, code, key)
+            job.background = background
+            self.next_job_id += 1
+            if background:
+                if key is not None:
+                    for queued in [j for j in self.background_queue if j.key == key]:
+                        self.background_queue.remove(queued)
+                        queued.finish(stale=True)
+                self.background_queue.append(job)
+            else:
+                self.interactive_queue.append(job)
+            self.queue_condition.notify()
+        return job
+
+    def dispatch_jobs(self):
+        """Envía los trabajos en cola a MATLAB respetando la prioridad"""
+        while self.running:
+            with self.queue_condition:
+                job = None
+                while self.running and job is None:
+                    if self.interactive_queue:
+                        job = self.interactive_queue.popleft()
+                    elif self.background_queue and not self.inflight:
+                        job = self.background_queue.popleft()
+                    else:
+                        self.queue_condition.wait(timeout=1.0)
+                if job is None:
+                    break
+                self.inflight.append(job)
+                if len(self.inflight) == 1:
+                    job.start(self.journal.end)
+
+            if not self.write_job(job):
+                with self.queue_condition:
+                    if job in self.inflight:
+                        self.inflight.remove(job)
+                    if self.inflight and self.inflight[0].start_offset is None:
+                        self.inflight[0].start(self.journal.end)
+                    self.queue_condition.notify()
+                job.finish(error=True)
+
+    def write_job(self, job):
+        """Escribe un trabajo en la entrada de MATLAB seguido de su marca de fin"""
+        if not self.matlab_process or self.matlab_process.poll() is not None:
+            self.log("MATLAB no está en ejecución")
+            return False
+        sentinel = f"fprintf('<<nvim-matlab-py:%d:%d>>\\n', {job.id}, ~isempty(lasterr));"
+        try:
+            with self.stdin_lock:
+                self.matlab_process.stdin.write(f"lasterr('');\n{job.code}\n{sentinel}\n")
+                self.matlab_process.stdin.flush()
+            return True
+        except Exception as e:
+            self.log(f"Error al enviar comando a MATLAB: {str(e)}")
+            return False
+
+    def job_finished(self, job_id, error):
+        """Marca como terminado el trabajo cuya marca de fin imprimió MATLAB"""
+        with self.queue_condition:
+            job = next((j for j in self.inflight if j.id == job_id), None)
+            if job is None:
+                return
+            self.inflight.remove(job)
+            job.end_offset = self.journal.end
+            # MATLAB ejecuta en orden: el siguiente trabajo empieza aquí
+            if self.inflight:
+                self.inflight[0].start(job.end_offset)
+            self.queue_condition.notify()
+        job.finish(error=error)
+        # Despertar a quien transmite la salida del trabajo aunque no haya datos nuevos
+        self.journal.wake()
+        self.record_history(job)
+
+    def record_history(self, job):
+        """Guarda en el historial un comando del usuario que llegó a ejecutarse"""
+        if self.history is None or job.background or job.started_at is None:
+            return
+        try:
+            self.history.record(job.code, job.start_offset, job.end_offset, job.submitted_at,
+                                job.started_at, job.finished_at, job.summary()["status"])
+        except OSError as e:
+            self.log(f"Error al guardar el historial: {str(e)}")
+
+    def cancel(self, job):
+        """Cancela un trabajo si aún no se envió a MATLAB"""
+        with self.queue_condition:
+            for queue in (self.interactive_queue, self.background_queue):
+                if job in queue:
+                    queue.remove(job)
+                    break
+            else:
+                return False
+        job.finish(stale=True)
+        return True
+
+    def broadcast(self, text):
+        """Reenvía la salida de MATLAB a los clientes suscritos"""
+        message = (json.dumps({"type": "output", "data": text}) + "\n").encode('utf-8')
+        with self.subscribers_lock:
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.sendall(message)
+                except OSError:
+                    self.subscribers.remove(subscriber)
+
+    def remote_exec(self, message):
+        """Ejecuta una petición remota; las reenviadas tras reconectar no se repiten"""
+        rid = message.get("rid")
+        with self.remote_jobs_lock:
+            if rid in self.remote_jobs:
+                # Sus eventos se repiten al reanudar la sesión (ver attach_session)
+                return
+            self.remote_jobs[rid] = self.submit_remote(message.get("code", ""), rid)
+            if len(self.remote_jobs) > REMOTE_JOBS_LIMIT:
+                finished = [r for r, j in self.remote_jobs.items() if j.done.is_set()]
+                for old in finished[:len(self.remote_jobs) - REMOTE_JOBS_LIMIT]:
+                    del self.remote_jobs[old]
+
+    def submit_remote(self, code, rid):
+        """Encola un trabajo remoto que avisa al empezar y al terminar"""
+        # El dispatcher no puede arrancar el trabajo hasta soltar el lock
+        with self.queue_condition:
+            job = self.submit(code)
+            job.rid = rid
+            job.on_start = self.remote_job_started
+            job.on_done = self.remote_job_done
+        return job
+
+    def remote_job_started(self, job):
+        self.publish_remote_event({"type": "started", "rid": job.rid, "start": job.start_offset})
+
+    def remote_job_done(self, job):
+        self.publish_remote_event(dict(job.summary(), type="done", rid=job.rid,
+                                       start=job.start_offset, end=job.end_offset))
+
+    def publish_remote_event(self, message):
+        """Envía un evento de trabajo remoto a todas las sesiones
+
+        Los eventos se guardan con el offset de la salida en que ocurrieron;
+        una sesión que reanuda desde un offset recibe de nuevo los posteriores.
+        """
+        with self.remote_events_lock:
+            event = (self.journal.end, message)
+            self.remote_events.append(event)
+            while self.remote_events and (len(self.remote_events) > REMOTE_EVENTS_LIMIT
+                                          or self.remote_events[0][0] < self.journal.base):
+                self.remote_events.popleft()
+            for session in self.remote_sessions:
+                session.events.append(event)
+        self.journal.wake()
+
+    def attach_session(self, session, offset):
+        """Registra una sesión y le repite los eventos desde `offset`"""
+        with self.remote_events_lock:
+            session.events.extend(event for event in self.remote_events if event[0] >= offset)
+            self.remote_sessions.append(session)
+
+    def detach_session(self, session):
+        with self.remote_events_lock:
+            if session in self.remote_sessions:
+                self.remote_sessions.remove(session)
+
+    def remote_cancel(self, rid):
+        with self.remote_jobs_lock:
+            job = self.remote_jobs.get(rid)
+        if job is not None:
+            self.cancel(job)
+
+    def lint_content(self, name, content, key=None):
+        """Analiza contenido enviado por un cliente remoto que no comparte disco"""
+        directory = tempfile.mkdtemp(prefix='nvim_matlab_py_lint_')
+        path = os.path.join(directory, os.path.basename(name) or 'untitled.m')
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            return self.lint(path, key)
+        finally:
+            try:
+                os.remove(path)
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+    def lint(self, path, key=None):
+        """Analiza un archivo con checkcode en la sesión de MATLAB en ejecución
+
+        El resultado se devuelve a través de un archivo temporal en JSON, sin
+        interpretar la salida de texto de MATLAB.
+        """
+        fd, result_path = tempfile.mkstemp(prefix='nvim_matlab_py_lint_', suffix='.json')
+        os.close(fd)
+        code = (
+            f"try, nvim_lint__ = checkcode({matlab_string(path)}, '-id'); "
+            f"nvim_fid__ = fopen({matlab_string(result_path)}, 'w'); "
+            "fprintf(nvim_fid__, '%s', jsonencode(nvim_lint__)); fclose(nvim_fid__); "
+            "catch, end; clear nvim_lint__ nvim_fid__"
+        )
+
+        def remove_result(job=None):
+            try:
+                os.remove(result_path)
+            except OSError:
+                pass
+
+        try:
+            job = self.submit(code, background=True, key=key)
+            if not job.done.wait(LINT_TIMEOUT):
+                # Ya nadie espera el resultado: sacarlo de la cola o, si MATLAB
+                # ya lo está ejecutando, borrar el archivo cuando termine
+                if not self.cancel(job):
+                    job.on_done = remove_result
+                    if job.done.is_set():
+                        remove_result()
+                return {"status": "error", "message": "Tiempo de espera agotado"}
+            if job.stale:
+                return {"status": "stale"}
+            with open(result_path, encoding='utf-8') as f:
+                content = f.read().strip()
+            if not content:
+                return {"status": "error", "message": "checkcode no devolvió resultados"}
+            messages = json.loads(content)
+            # jsonencode devuelve un objeto, no una lista, cuando hay un solo mensaje
+            if isinstance(messages, dict):
+                messages = [messages]
+            diagnostics = []
+            for message in messages:
+                column = message.get("column") or [1, 1]
+                if not isinstance(column, list):
+                    column = [column, column]
+                diagnostics.append({
+                    "line": message.get("line", 1),
+                    "column": column,
+                    "message": message.get("message", ""),
+                    "id": message.get("id", ""),
+                })
+            return {"status": "success", "diagnostics": diagnostics}
+        except Exception as e:
+            self.log(f"Error al analizar {path}: {str(e)}")
+            return {"status": "error", "message": str(e)}
+        finally:
+            remove_result()
+
     def start_server(self):
         """Inicia el servidor de socket"""
         try:
@@ -101,6 +575,14 @@ class MatlabServer:
     
     def cleanup(self):
         """Limpia recursos al cerrar"""
+        with self.subscribers_lock:
+            for subscriber in self.subscribers:
+                try:
+                    subscriber.close()
+                except OSError:
+                    pass
+            self.subscribers = []
+
         if self.matlab_process:
             try:
                 self.log("Terminando proceso MATLAB...")
@@ -118,6 +600,9 @@ class MatlabServer:
                 self.log("Socket cerrado")
             except Exception as e:
                 self.log(f"Error al cerrar socket: {str(e)}")
+
+        if self.history is not None:
+            self.history.close()
     
     def run(self):
         """Ejecuta el bucle principal del servidor"""
@@ -129,6 +614,9 @@ class MatlabServer:
             self.log("No se pudo iniciar el servidor, abortando...")
             return False
         
+        dispatcher = threading.Thread(target=self.dispatch_jobs, daemon=True)
+        dispatcher.start()
+
         self.log("Servidor iniciado completamente")
         
         while self.running:
@@ -138,7 +626,9 @@ class MatlabServer:
                 try:
                     client_socket, address = self.socket.accept()
                     self.log(f"Nueva conexión desde {address}")
-                    self.handle_client(client_socket)
+                    # Cada cliente en su propio hilo: un análisis en espera no bloquea a los demás
+                    thread = threading.Thread(target=self.handle_client, args=(client_socket,), daemon=True)
+                    thread.start()
                 except socket.timeout:
                     # Es normal que ocurra timeout, permite verificar si seguimos ejecutando
                     continue
@@ -150,8 +640,43 @@ class MatlabServer:
         self.log("Servidor detenido")
         return True
     
+    def parse_request(self, message):
+        """Interpreta una petición: JSON con campo `type` o texto plano (comando)"""
+        if message.lstrip().startswith('{'):
+            try:
+                request = json.loads(message)
+                if isinstance(request, dict) and "type" in request:
+                    return request
+            except ValueError:
+                pass
+        return {"type": "exec", "code": message.strip()}
+
+    def send_json(self, client_socket, response):
+        """Envía una respuesta JSON terminada en newline"""
+        client_socket.sendall((json.dumps(response) + "\n").encode('utf-8'))
+
+    def handle_session(self, client_socket, hello):
+        """Inicia una sesión remota y la atiende hasta que se cierre"""
+        codec = negotiate_codec(hello.get("compress"))
+        flush_window = max(int(hello.get("flush_window", self.flush_window)), 1) / 1000.0
+        # Un cliente de esta misma instancia reanuda desde su último offset confirmado
+        if hello.get("instance") == self.instance:
+            offset = max(int(hello.get("ack", 0)), self.journal.base)
+        else:
+            offset = self.journal.end
+        client_socket.settimeout(HEARTBEAT_TIMEOUT)
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send_json(client_socket, {
+            "status": "success", "instance": self.instance, "offset": offset, "compress": codec
+        })
+        self.log(f"Sesión remota iniciada ({codec}, offset {offset})")
+        session = RemoteSession(self, client_socket, codec, flush_window, offset)
+        self.attach_session(session, offset)
+        session.run()
+
     def handle_client(self, client_socket):
         """Maneja una conexión de cliente"""
+        keep_open = False
         try:
             client_socket.settimeout(0.5)  # Timeout más corto para clientes
             
@@ -175,31 +700,47 @@ class MatlabServer:
                 client_socket.close()
                 return
             
-            # Procesar el comando
-            command = data.decode('utf-8').strip()
-            self.log(f"Comando recibido: {command}")
-            
-            # Enviar el comando a MATLAB
-            if self.matlab_process and self.matlab_process.poll() is None:
-                try:
-                    self.matlab_process.stdin.write(command + "\n")
-                    self.matlab_process.stdin.flush()
-                    
-                    # Enviar respuesta de éxito al cliente
-                    response = json.dumps({"status": "success"})
-                    client_socket.sendall(response.encode('utf-8'))
-                except Exception as e:
-                    self.log(f"Error al enviar comando a MATLAB: {str(e)}")
-                    response = json.dumps({"status": "error", "message": str(e)})
-                    client_socket.sendall(response.encode('utf-8'))
+            # Procesar la petición
+            request = self.parse_request(data.decode('utf-8'))
+            kind = request.get("type")
+            self.log(f"Petición recibida: {kind}")
+
+            if kind == "exec":
+                # Enviar el comando a MATLAB
+                if self.matlab_process and self.matlab_process.poll() is None:
+                    job = self.submit(request.get("code", ""))
+                    if request.get("stream"):
+                        # Devolver la salida del trabajo y avisar al terminar
+                        stream_job(client_socket, self.journal, job, self.cancel)
+                    else:
+                        self.send_json(client_socket, {"status": "success", "id": job.id})
+                else:
+                    self.log("MATLAB no está en ejecución")
+                    response = {"status": "error", "message": "MATLAB no está en ejecución"}
+                    if request.get("stream"):
+                        response["type"] = "done"
+                    self.send_json(client_socket, response)
+            elif kind == "lint":
+                self.send_json(client_socket, self.lint(request.get("path", ""), request.get("key")))
+            elif kind == "subscribe":
+                # La conexión queda abierta y recibe toda la salida de MATLAB
+                client_socket.settimeout(None)
+                self.send_json(client_socket, {"status": "success"})
+                with self.subscribers_lock:
+                    self.subscribers.append(client_socket)
+                keep_open = True
+            elif kind == "session":
+                self.handle_session(client_socket, request)
+            elif kind == "shutdown":
+                self.send_json(client_socket, {"status": "success"})
+                self.running = False
             else:
-                self.log("MATLAB no está en ejecución")
-                response = json.dumps({"status": "error", "message": "MATLAB no está en ejecución"})
-                client_socket.sendall(response.encode('utf-8'))
+                self.send_json(client_socket, {"status": "error", "message": f"Petición desconocida: {kind}"})
         except Exception as e:
             self.log(f"Error al manejar cliente: {str(e)}")
         finally:
-            client_socket.close()
+            if not keep_open:
+                client_socket.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Servidor para comunicación con MATLAB')
@@ -209,13 +750,23 @@ def main():
                       help='Puerto para el servidor (predeterminado: 43889)')
     parser.add_argument('--host', dest='host', default='127.0.0.1',
                       help='Host para el servidor (predeterminado: 127.0.0.1)')
+    parser.add_argument('--flush-window', dest='flush_window', type=int, default=50,
+                      help='Ms que se agrupa la salida para sesiones remotas (predeterminado: 50)')
+    parser.add_argument('--replay-buffer', dest='replay_buffer', type=int, default=8,
+                      help='MB de salida conservados para reanudar sesiones remotas (predeterminado: 8)')
+    add_history_arguments(parser)
     
     args = parser.parse_args()
     
     server = MatlabServer(
         matlab_executable=args.matlab_executable,
         port=args.port,
-        host=args.host
+        host=args.host,
+        flush_window=args.flush_window,
+        replay_buffer=args.replay_buffer,
+        history=args.history,
+        history_days=args.history_days,
+        history_size=args.history_size
     )
     
     success = server.run()
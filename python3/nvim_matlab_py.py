@@ -1,18 +1,17 @@
 import os
-import re
-import subprocess
-import time
-import threading
-import pynvim
+
+# subprocess, threading, socket, re y pynvim se importan dentro de las funciones que
+# los usan para que `python3 import nvim_matlab_py` sea lo más barato posible
 
 # Variables globales
-matlab_process = None
 matlab_output_buffer = None
 matlab_output_window = None
+output_socket = None
 thread_running = False
 
 def _get_nvim():
     """Obtiene el objeto nvim actual"""
+    import pynvim
     try:
         return pynvim.api.nvim.Nvim.from_nvim()
     except:
@@ -76,37 +75,75 @@ def _update_output_buffer(nvim, text):
     if matlab_output_window is not None:
         nvim.command('noautocmd call win_execute({}, "normal! G")'.format(matlab_output_window.handle))
 
-def _read_matlab_output(nvim):
-    """Lee la salida de MATLAB continuamente"""
-    global matlab_process, thread_running
-    
-    # Marcar el hilo como en ejecución
-    thread_running = True
+def _server_address(nvim):
+    """Devuelve (host, puerto) del servidor MATLAB"""
+    host = nvim.vars.get('matlab_server_host', '127.0.0.1')
+    port = int(nvim.vars.get('matlab_server_port', 43889))
+    return host, port
+
+def _server_module(nvim, call):
+    """Evalúa `call` sobre el módulo Lua nvim-matlab-py.server"""
+    return nvim.exec_lua(f"return require('nvim-matlab-py.server').{call}")
+
+def _history_directory(nvim):
+    """Directorio del historial persistente, o None si está desactivado"""
+    return _server_module(nvim, 'history_directory()')
+
+def _server_running(address):
+    """Comprueba si el servidor MATLAB acepta conexiones"""
+    import socket
+    try:
+        with socket.create_connection(address, timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def _request(address, request, timeout=5.0):
+    """Envía una petición JSON al servidor MATLAB y devuelve su respuesta"""
+    import json
+    import socket
+    with socket.create_connection(address, timeout=timeout) as sock:
+        sock.sendall((json.dumps(request) + "\n").encode('utf-8'))
+        reply = sock.makefile('rb').readline()
+    if not reply:
+        return {"status": "error", "message": "El servidor no respondió"}
+    return json.loads(reply.decode('utf-8'))
+
+def _read_matlab_output(nvim, address):
+    """Lee la salida de MATLAB que reenvía el servidor"""
+    global thread_running, output_socket
+    import json
+    import socket
     
-    while thread_running and matlab_process and matlab_process.poll() is None:
-        try:
-            # Leer una línea de la salida de MATLAB
-            line = matlab_process.stdout.readline()
-            if line:
+    try:
+        output_socket = socket.create_connection(address)
+        output_socket.sendall((json.dumps({"type": "subscribe"}) + "\n").encode('utf-8'))
+        for raw in output_socket.makefile('rb'):
+            if not thread_running:
+                break
+            message = json.loads(raw.decode('utf-8'))
+            if message.get("type") == "output":
                 # Programar la actualización del buffer en el hilo principal de Neovim
-                nvim.async_call(_update_output_buffer, nvim, line)
-        except Exception as e:
+                nvim.async_call(_update_output_buffer, nvim, message["data"])
+    except Exception as e:
+        if thread_running:
             nvim.async_call(nvim.command, f'echom "Error leyendo salida de MATLAB: {str(e)}"')
-            break
     
     # Marcar el hilo como detenido
     thread_running = False
+    output_socket = None
 
 def start_matlab_server():
     """Inicia el servidor de MATLAB y muestra su salida en un buffer"""
-    global matlab_process, thread_running
+    global thread_running
+    import threading
+    import time
     
     nvim = _get_nvim()
     if not nvim:
         return
     
-    # Detener cualquier proceso de MATLAB existente
-    if matlab_process is not None and matlab_process.poll() is None:
+    if thread_running:
         nvim.command('echom "MATLAB ya está en ejecución"')
         return
     
@@ -114,44 +151,53 @@ def start_matlab_server():
     _create_output_buffer(nvim)
     _update_output_buffer(nvim, "=== Iniciando MATLAB ===\n")
     
-    # Iniciar MATLAB
+    address = _server_address(nvim)
     matlab_executable = nvim.vars.get('matlab_executable', 'matlab')
     
-    try:
-        args = [matlab_executable, '-nodesktop', '-nosplash']
-        matlab_process = subprocess.Popen(
-            args,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
-        
-        # Iniciar un hilo para leer la salida
-        output_thread = threading.Thread(target=_read_matlab_output, args=(nvim,))
-        output_thread.daemon = True
-        output_thread.start()
+    # Reutilizar una sesión ya en ejecución; si no hay, lanzar matlab_server.py
+    # o, en modo remoto, el relay local hacia el servidor del nodo de cómputo.
+    # El arranque es el mismo que el de la API de Lua (server.spawn)
+    if not _server_running(address):
+        job = _server_module(nvim, 'spawn()')
+        if job <= 0:
+            nvim.command('echoerr "Error al iniciar el servidor MATLAB"')
+            return
         
+        # Esperar a que el servidor acepte conexiones
+        for _ in range(100):  # Esperar hasta 10 segundos
+            if _server_running(address):
+                break
+            if not _server_module(nvim, 'running()'):
+                nvim.command('echoerr "No se pudo iniciar MATLAB en ' + matlab_executable + ' (revise el log del servidor)"')
+                return
+            time.sleep(0.1)
+        else:
+            nvim.command('echoerr "El servidor MATLAB no respondió a tiempo"')
+            return
+    
+    # Iniciar un hilo para leer la salida
+    thread_running = True
+    output_thread = threading.Thread(target=_read_matlab_output, args=(nvim, address))
+    output_thread.daemon = True
+    output_thread.start()
+    
+    try:
         # Enviar un comando inicial para verificar que MATLAB está funcionando
-        matlab_process.stdin.write("disp('MATLAB iniciado correctamente');\n")
-        matlab_process.stdin.flush()
-        
+        _request(address, {"type": "exec", "code": "disp('MATLAB iniciado correctamente');"})
         nvim.command('echom "Servidor MATLAB iniciado"')
-    except FileNotFoundError:
-        nvim.command('echoerr "No se encontró MATLAB en ' + matlab_executable + '"')
     except Exception as e:
         nvim.command('echoerr "Error al iniciar MATLAB: ' + str(e) + '"')
 
 def stop_matlab_server():
     """Detiene el servidor MATLAB"""
-    global matlab_process, thread_running
+    global thread_running
     
     nvim = _get_nvim()
     if not nvim:
         return
     
-    if matlab_process is None or matlab_process.poll() is not None:
+    address = _server_address(nvim)
+    if not _server_running(address):
         nvim.command('echom "No hay servidor MATLAB en ejecución"')
         return
     
@@ -159,24 +205,9 @@ def stop_matlab_server():
         # Detener el hilo de lectura
         thread_running = False
         
-        # Enviar comando de salida a MATLAB
-        matlab_process.stdin.write("exit;\n")
-        matlab_process.stdin.flush()
-        
-        # Esperar a que termine
-        for _ in range(10):  # Esperar hasta 1 segundo
-            if matlab_process.poll() is not None:
-                break
-            time.sleep(0.1)
-        
-        # Si sigue en ejecución, terminarlo
-        if matlab_process.poll() is None:
-            matlab_process.terminate()
-            time.sleep(0.5)
-            if matlab_process.poll() is None:
-                matlab_process.kill()
-        
-        matlab_process = None
+        # El servidor cierra MATLAB y libera el puerto; si lo lanzó esta
+        # instancia, se espera a que termine
+        _server_module(nvim, 'shutdown()')
         nvim.command('echom "Servidor MATLAB detenido"')
         
         # Actualizar el buffer de salida
@@ -186,27 +217,27 @@ def stop_matlab_server():
 
 def _send_to_matlab(command):
     """Envía un comando a MATLAB"""
-    global matlab_process
-    
     nvim = _get_nvim()
     if not nvim:
         return
     
     # Comprobar si MATLAB está en ejecución
-    if matlab_process is None or matlab_process.poll() is not None:
+    if not thread_running:
         nvim.command('echom "MATLAB no está en ejecución. Iniciando..."')
         start_matlab_server()
-        # Esperar un momento para que MATLAB se inicie
-        time.sleep(1)
+        if not thread_running:
+            return
+    
+    # Mostrar el comando en el buffer de salida
+    _update_output_buffer(nvim, f"\n>> {command}\n")
     
     # Enviar el comando
     try:
-        matlab_process.stdin.write(command + "\n")
-        matlab_process.stdin.flush()
-        nvim.command('echom "Comando enviado a MATLAB"')
-        
-        # Mostrar el comando en el buffer de salida
-        _update_output_buffer(nvim, f"\n>> {command}\n")
+        response = _request(_server_address(nvim), {"type": "exec", "code": command})
+        if response.get("status") == "success":
+            nvim.command('echom "Comando enviado a MATLAB"')
+        else:
+            nvim.command('echoerr "Error al enviar comando a MATLAB: ' + response.get("message", "") + '"')
     except Exception as e:
         nvim.command('echoerr "Error al enviar comando a MATLAB: ' + str(e) + '"')
 
@@ -226,7 +257,8 @@ def run_file():
     basename = os.path.splitext(filename)[0]
     
     # Comandos para MATLAB
-    cd_cmd = f"cd('{directory.replace("'", "''")}');"
+    escaped_directory = directory.replace("'", "''")
+    cd_cmd = f"cd('{escaped_directory}');"
     run_cmd = f"run('{basename}');"
     
     _send_to_matlab(cd_cmd)
@@ -314,6 +346,7 @@ def run_selection():
 
 def toggle_file():
     """Alterna entre un archivo .m y su archivo de test correspondiente"""
+    import re
     nvim = _get_nvim()
     if not nvim:
         return
@@ -385,3 +418,90 @@ def toggle_matlab_window():
         nvim.command(f'buffer {matlab_output_buffer.number}')
         matlab_output_window = nvim.current.window
         nvim.current.window = current_window
+
+def _show_history(nvim, lines):
+    """Muestra líneas en el buffer del historial, abriéndolo si hace falta"""
+    buffer = next((buf for buf in nvim.buffers if buf.name.endswith('MATLAB_HISTORY')), None)
+    window = None
+    if buffer is not None:
+        window = next((win for win in nvim.windows if win.buffer == buffer), None)
+    if window is not None:
+        nvim.current.window = window
+    elif buffer is not None:
+        nvim.command(f'split | buffer {buffer.number}')
+    else:
+        nvim.command('split MATLAB_HISTORY')
+        buffer = nvim.current.buffer
+        nvim.command('setlocal buftype=nofile bufhidden=hide noswapfile nowrap')
+        # <CR> abre la entrada bajo el cursor; en una entrada, vuelve a la lista
+        nvim.command("nnoremap <buffer> <silent> <CR> :execute 'MatlabHistory ' . "
+                     "matchstr(getline(search('^#\\d', 'bcnW')), '^#\\d\\+')<CR>")
+        nvim.command('nnoremap <buffer> <silent> q :close<CR>')
+    buffer.options['modifiable'] = True
+    buffer[:] = lines
+    buffer.options['modifiable'] = False
+    nvim.current.window.cursor = (1, 0)
+
+def matlab_history(args=''):
+    """Muestra el historial persistente de comandos
+
+    Sin argumentos lista los últimos comandos; con /patrón/ busca en los
+    comandos y en su salida; con #id (o id) muestra un comando y su salida.
+    """
+    import re
+    import time
+    from matlab_history import HistoryStore
+    
+    nvim = _get_nvim()
+    if not nvim:
+        return
+    
+    directory = _history_directory(nvim)
+    if directory is None:
+        nvim.command('echom "El historial de MATLAB está desactivado (g:matlab_history)"')
+        return
+    
+    store = HistoryStore(directory)
+    limit = int(nvim.vars.get('matlab_history_results', 200))
+    args = args.strip()
+    
+    def header(entry):
+        finished = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.finished_at))
+        return f"#{entry.id:<6} {finished} {entry.duration:9.3f}s  {entry.status:<9}"
+    
+    # Una entrada concreta: su comando y su salida
+    if re.fullmatch(r'#?\d+', args):
+        entry = store.get(int(args.lstrip('#')))
+        if entry is None:
+            nvim.command(f'echoerr "No existe la entrada {args} en el historial"')
+            return
+        lines = ['% ' + header(entry).rstrip()]
+        lines += entry.command.splitlines()
+        lines += ['% ---- salida ----']
+        lines += entry.output.splitlines()
+        _show_history(nvim, lines)
+        return
+    
+    if args:
+        # :MatlabHistory /patrón/ (las barras son opcionales)
+        pattern = args[1:-1] if len(args) > 1 and args.startswith('/') and args.endswith('/') else args
+        try:
+            entries = store.search(pattern, limit)
+        except re.error as e:
+            nvim.command(f'echoerr "Patrón no válido: {str(e)}"')
+            return
+    else:
+        entries = store.latest(limit)
+    
+    if not entries:
+        nvim.command('echom "No hay entradas en el historial de MATLAB"' if not args
+                     else 'echom "Sin coincidencias en el historial de MATLAB"')
+        return
+    
+    lines = []
+    for entry in entries:
+        command = entry.command.splitlines() or ['']
+        lines.append(f"{header(entry)} {command[0]}")
+        if args:
+            lines.append(f"    {entry.match}: {entry.line}")
+    _show_history(nvim, lines)
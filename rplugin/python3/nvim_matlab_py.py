@@ -66,7 +66,8 @@ class NvimMatlabPy:
         basename = os.path.splitext(filename)[0]
         
         # Comandos para MATLAB
-        cd_cmd = f"cd('{directory.replace("'", "''")}');"
+        escaped_directory = directory.replace("'", "''")
+        cd_cmd = f"cd('{escaped_directory}');"
         run_cmd = f"run('{basename}');"
         
         self.matlab.send_command(cd_cmd)
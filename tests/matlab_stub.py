@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""MATLAB mínimo para las pruebas: entiende lo que envía matlab_server.py
+
+- la marca de fin de cada trabajo (fprintf('<<nvim-matlab-py:%d:%d>>\\n', id, ...))
+- disp('texto')
+- pause(segundos)
+- spam(n, 'etiqueta'): imprime n líneas numeradas con la etiqueta
+"""
+
+import re
+import sys
+import time
+
+SENTINEL = re.compile(r"<<nvim-matlab-py:%d:%d>>\\n', (\d+),")
+
+
+def main():
+    for line in sys.stdin:
+        line = line.strip()
+        match = SENTINEL.search(line)
+        if match:
+            print(f">> <<nvim-matlab-py:{match.group(1)}:0>>", flush=True)
+            continue
+        match = re.fullmatch(r"disp\('(.*)'\);?", line)
+        if match:
+            print(match.group(1), flush=True)
+            continue
+        match = re.fullmatch(r"pause\(([\d.]+)\);?", line)
+        if match:
+            time.sleep(float(match.group(1)))
+            continue
+        match = re.fullmatch(r"spam\((\d+), '(.*)'\);?", line)
+        if match:
+            for number in range(int(match.group(1))):
+                print(f"{match.group(2)} {number:06d}", flush=True)
+            continue
+        if line == 'exit':
+            break
+
+
+if __name__ == '__main__':
+    main()
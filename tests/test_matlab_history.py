@@ -0,0 +1,123 @@
+"""Pruebas del historial persistente (python3/matlab_history.py)"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python3'))
+
+from matlab_history import HistoryStore  # noqa: E402
+
+
+class HistorySearchTest(unittest.TestCase):
+    COUNT = 42
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(self.directory.name, writable=True)
+        offset = 0
+        # Salida que no pertenece a ningún comando, como el banner de MATLAB
+        offset = self.append(offset, 'banner cmd1\n')
+        for number in range(1, self.COUNT + 1):
+            offset = self.execute(offset, f'cmd{number}', f'result {number}\nok\n')
+        self.offset = offset
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def append(self, offset, text):
+        data = text.encode('utf-8')
+        self.store.append_output(offset, data)
+        return offset + len(data)
+
+    def execute(self, offset, command, output):
+        end = self.append(offset, output)
+        now = time.time()
+        self.store.record(command, offset, end, now, now, now + 0.01, 'success')
+        return end
+
+    def reader(self):
+        return HistoryStore(self.directory.name)
+
+    def commands(self, entries):
+        return sorted(entry.command for entry in entries)
+
+    def test_unanchored_search_matches_every_entry(self):
+        # cmd1 y cmd10..cmd19 en los comandos; el banner no cuenta
+        entries = self.reader().search('cmd1')
+        self.assertEqual(self.commands(entries), sorted(['cmd1'] + [f'cmd{n}' for n in range(10, 20)]))
+
+    def test_caret_anchors_each_line(self):
+        entries = self.reader().search('^cmd1')
+        self.assertEqual(len(entries), 11)
+        entries = self.reader().search('^result 4')
+        self.assertEqual(self.commands(entries), ['cmd4', 'cmd40', 'cmd41', 'cmd42'])
+        self.assertTrue(all(entry.match == 'output' for entry in entries))
+
+    def test_dollar_anchors_each_line(self):
+        entries = self.reader().search(r'cmd1\d$')
+        self.assertEqual(self.commands(entries), [f'cmd{n}' for n in range(10, 20)])
+        entries = self.reader().search('^ok$')
+        self.assertEqual(len(entries), self.COUNT)
+        self.assertEqual(entries[0].line, 'ok')
+
+    def test_search_after_compaction(self):
+        # Conservar aproximadamente las últimas diez entradas
+        self.store.max_bytes = 10 * (len('result 42\nok\n') + len('cmd42\n'))
+        self.store.compact()
+        reader = self.reader()
+        kept = reader.latest(self.COUNT)
+        self.assertLess(len(kept), self.COUNT)
+        self.assertEqual(kept[0].id, self.COUNT)
+        first_kept = kept[-1].id
+
+        entries = reader.search(r'^cmd\d+$')
+        self.assertEqual(sorted(entry.id for entry in entries), list(range(first_kept, self.COUNT + 1)))
+        entries = reader.search(r'^result 4\d?$')
+        self.assertEqual(self.commands(entries),
+                         [f'cmd{n}' for n in (40, 41, 42) if n >= first_kept])
+        self.assertEqual(reader.get(self.COUNT).output, f'result {self.COUNT}\nok\n')
+        self.assertIsNone(reader.get(1))
+
+        # Lo escrito tras compactar sigue en el rango correcto
+        now = time.time()
+        offset = self.store.stream_end
+        end = self.append(offset, 'result after\n')
+        self.store.record('after', offset, end, now, now, now, 'success')
+        entries = self.reader().search('^result after$')
+        self.assertEqual([entry.command for entry in entries], ['after'])
+        self.assertEqual(self.reader().get(entries[0].id).output, 'result after\n')
+
+    def test_record_does_not_wait_for_compaction(self):
+        self.store.max_bytes = 10 * (len('result 42\nok\n') + len('cmd42\n'))
+        offset = self.offset
+
+        def record_more():
+            nonlocal offset
+            for number in range(1, 21):
+                offset = self.execute(offset, f'more{number}', f'more result {number}\n')
+
+        # Con una compactación en curso, registrar no espera a que termine
+        with self.store.compact_lock:
+            recorder = threading.Thread(target=record_more)
+            recorder.start()
+            recorder.join(5)
+            self.assertFalse(recorder.is_alive())
+            self.assertEqual(len(self.reader()), self.COUNT + 20)
+        self.store.compactor.join(5)
+        self.assertFalse(self.store.compactor.is_alive())
+
+        reader = self.reader()
+        self.assertLess(len(reader), self.COUNT + 20)
+        self.assertEqual(reader.latest(1)[0].command, 'more20')
+        entries = reader.search('^more result 20$')
+        self.assertEqual([entry.command for entry in entries], ['more20'])
+        self.assertEqual(reader.get(entries[0].id).output, 'more result 20\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
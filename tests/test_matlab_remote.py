@@ -0,0 +1,160 @@
+"""Pruebas del modo remoto en loopback (python3/matlab_remote.py)
+
+Arrancan matlab_server.py con tests/matlab_stub.py en lugar de MATLAB y se
+conectan con un RemoteClient, como hace el relay.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'python3'))
+
+from matlab_remote import RemoteClient  # noqa: E402
+
+SERVER = os.path.join(ROOT, 'python3', 'matlab_server.py')
+STUB = os.path.join(ROOT, 'tests', 'matlab_stub.py')
+TIMEOUT = 15.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@unittest.skipIf(os.name == 'nt', 'el MATLAB de prueba es un script POSIX')
+class RemoteLoopbackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.port = free_port()
+        self.server = None
+        self.start_server()
+        self.condition = threading.Condition()
+        # Salida recibida por offset y eventos con el offset recibido al llegar
+        self.output = bytearray()
+        self.output_base = None
+        self.output_end = None
+        self.gaps = []
+        self.events = []
+        self.client = RemoteClient('127.0.0.1', self.port, flush_window=5,
+                                   on_output=self.receive_output, on_event=self.receive_event)
+        self.client.start()
+        self.addCleanup(self.client.stop)
+        self.assertTrue(self.client.connected.wait(TIMEOUT))
+
+    def start_server(self):
+        self.server = subprocess.Popen(
+            [sys.executable, SERVER, '--matlab', STUB, '--port', str(self.port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.addCleanup(self.stop_server, self.server)
+        deadline = time.time() + TIMEOUT
+        while time.time() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        self.fail('matlab_server.py no empezó a escuchar')
+
+    def stop_server(self, process):
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def receive_output(self, offset, data):
+        with self.condition:
+            if self.output_base is None or offset < self.output_end:
+                # Primera salida, o la de un servidor reiniciado
+                self.output = bytearray()
+                self.output_base = offset
+            elif offset != self.output_end:
+                self.gaps.append((self.output_end, offset))
+            self.output[offset - self.output_base:] = data
+            self.output_end = offset + len(data)
+            self.condition.notify_all()
+
+    def receive_event(self, message):
+        with self.condition:
+            self.events.append((message, self.client.offset))
+            self.condition.notify_all()
+
+    def wait_done(self, rid):
+        with self.condition:
+            self.assertTrue(self.condition.wait_for(lambda: self.done_events(rid), TIMEOUT),
+                            f'no llegó el fin de {rid}')
+            return self.done_events(rid)[0]
+
+    def done_events(self, rid):
+        return [message for message, _ in self.events if message.get('rid') == rid and message['type'] == 'done']
+
+    def job_output(self, done):
+        with self.condition:
+            data = self.output[done['start'] - self.output_base:done['end'] - self.output_base]
+        return data.decode('utf-8')
+
+    def exec(self, code):
+        return self.client.request({'type': 'exec', 'code': code})
+
+    def test_resume_after_reconnect(self):
+        rid = self.exec("spam(500, 'before');\npause(1);\nspam(500, 'after');")
+        with self.condition:
+            self.assertTrue(self.condition.wait_for(lambda: b'before 000499' in self.output, TIMEOUT))
+        # Cortar la conexión: la segunda mitad y el fin llegan mientras está caída
+        self.client.sock.shutdown(socket.SHUT_RDWR)
+
+        done = self.wait_done(rid)
+        self.assertEqual(done['status'], 'success')
+        expected = ''.join(f'{tag} {number:06d}\n' for tag in ('before', 'after') for number in range(500))
+        self.assertEqual(self.job_output(done), expected)
+        self.assertEqual(self.gaps, [])
+
+    def test_duplicate_rid_runs_once(self):
+        message = {'type': 'exec', 'code': "disp('only once');", 'rid': 'duplicate-1'}
+        self.client.send(message)
+        self.client.send(message)
+        done = self.wait_done('duplicate-1')
+        # Un trabajo posterior asegura que un segundo envío ya habría terminado
+        self.wait_done(self.exec("disp('next');"))
+
+        self.assertEqual(self.job_output(done), 'only once\n')
+        self.assertEqual(self.output.count(b'only once'), 1)
+        self.assertEqual(len(self.done_events('duplicate-1')), 1)
+
+    def test_done_arrives_after_job_output(self):
+        rids = [self.exec(f"spam(200, 'job{number}');") for number in range(10)]
+        for number, rid in enumerate(rids):
+            done = self.wait_done(rid)
+            received = next(offset for message, offset in self.events if message is done)
+            # Toda la salida del trabajo llegó antes que su fin, y nada del siguiente
+            self.assertEqual(received, done['end'])
+            self.assertEqual(self.job_output(done),
+                             ''.join(f'job{number} {line:06d}\n' for line in range(200)))
+        self.assertEqual(self.gaps, [])
+
+    def test_pending_requests_fail_when_server_restarts(self):
+        rid = self.exec("pause(30);")
+        with self.condition:
+            self.assertTrue(self.condition.wait_for(
+                lambda: any(message.get('rid') == rid for message, _ in self.events), TIMEOUT))
+        self.stop_server(self.server)
+        self.start_server()
+
+        done = self.wait_done(rid)
+        self.assertEqual(done['status'], 'failed')
+        # El servidor nuevo no repite lo que se pidió al anterior
+        self.assertEqual(self.wait_done(self.exec("disp('fresh');"))['status'], 'success')
+        self.assertEqual(len(self.done_events(rid)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()